@@ -0,0 +1,233 @@
+from functools import partial
+from itertools import islice
+from logging import getLogger
+from math import ceil
+import os
+import pickle
+import time
+from typing import Any, Callable, Iterable, List
+from unittest import main, TestCase
+
+from process import run_processes
+from thread import Arguments, DEFAULT_MAX_WORKERS, Result, run_threads
+
+
+class BatchPlan:
+    """
+    How run_batch executes a batch, chosen from the wall and thread CPU time per item of a sample:
+        inline - items are cheaper than dispatching them, or CPU-bound without several CPUs / a picklable target
+        threads - items mostly wait (I/O, sleep, native code releasing the GIL)
+        processes - items mostly compute and there are several CPUs, in chunks of about CHUNK_SECONDS
+    """
+    # an item shorter than this is not worth a thread or process dispatch
+    INLINE_ITEM_SECONDS = 50e-6
+    # the rest of a batch known to be shorter than this is run inline
+    INLINE_TOTAL_SECONDS = .05
+    # thread CPU / wall time above which an item is CPU-bound
+    CPU_BOUND_RATIO = .5
+    CHUNK_SECONDS = .02
+
+    __slots__ = ('mode', 'max_workers', 'chunksize', 'sample', 'wall', 'cpu', 'reason')
+
+    def __init__(self, mode: str, max_workers: int, chunksize: int, sample: int, wall: float, cpu: float,
+                 reason: str):
+        self.mode = mode
+        self.max_workers = max_workers
+        self.chunksize = chunksize
+        self.sample = sample
+        self.wall = wall  # seconds per item
+        self.cpu = cpu
+        self.reason = reason
+
+    @classmethod
+    def choose(cls, wall: float, cpu: float, sample: int, *, rest: int | None = None, cpus: int = 1,
+               picklable: bool | Callable[[], bool] = True, max_workers: int | None = None) -> 'BatchPlan':
+        """
+        rest: number of items left after the sample, None - unknown
+        picklable: or a function checking it, called only for CPU-bound items on several CPUs
+        """
+        def _plan(mode: str, workers: int, chunksize: int, reason: str) -> BatchPlan:
+            return cls(mode, workers, chunksize, sample, wall, cpu, reason)
+
+        if wall < cls.INLINE_ITEM_SECONDS:
+            return _plan('inline', 1, 1, f'items take less than {cls.INLINE_ITEM_SECONDS * 1e6:.0f} us')
+        if rest is not None and wall * rest < cls.INLINE_TOTAL_SECONDS:
+            return _plan('inline', 1, 1, f'the rest takes less than {cls.INLINE_TOTAL_SECONDS} sec.')
+        if cpu / wall < cls.CPU_BOUND_RATIO:
+            return _plan('threads', max_workers or DEFAULT_MAX_WORKERS, 1, 'items mostly wait')
+        if cpus < 2:
+            return _plan('inline', 1, 1, 'items are CPU-bound on a single CPU')
+        if not (picklable() if callable(picklable) else picklable):
+            return _plan('inline', 1, 1, 'items are CPU-bound, but target is not picklable for processes')
+        workers = max_workers or cpus
+        chunksize = max(1, ceil(cls.CHUNK_SECONDS / wall))
+        if rest is not None:  # leave a few chunks per worker for balance
+            chunksize = max(1, min(chunksize, rest // (4 * workers)))
+        return _plan('processes', workers, chunksize, 'items are CPU-bound')
+
+    def __str__(self):
+        return (f'{self.mode} (workers: {self.max_workers}, chunksize: {self.chunksize}): {self.reason};'
+                f' sample of {self.sample}: wall {self.wall * 1e3:.3f} ms/item,'
+                f' cpu {self.cpu / self.wall if self.wall else 0.:.0%}')
+
+    def __repr__(self):
+        return f'BatchPlan({self})'
+
+
+def _picklable(target: Callable) -> bool:
+    try:
+        pickle.dumps(target)
+        return True
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+
+
+def run_batch(target: Callable, args: Iterable[Arguments], *, sample_size: int = 8, sample_seconds: float = .1,
+              max_workers: int | None = None, capture: bool = False, fail_fast: bool = False,
+              report: Callable[[BatchPlan], Any] | None = None) -> tuple:
+    """
+    Purpose:
+        run_threads / run_processes / a plain loop, whichever suits target: the first items (up to sample_size,
+        or fewer once they take sample_seconds) run inline and are timed, the rest runs as BatchPlan.choose decides.
+        The plan is passed to report (default: logged at INFO level).
+        Results are in the order of args; capture and fail_fast are as in run_threads.
+    Usage:
+    results = run_batch(parse, (Arguments(line) for line in lines), report=print)
+    """
+    total = len(args) if hasattr(args, '__len__') else None
+    args = iter(args)
+    results: List[Result] = []
+    wall = cpu = 0
+    deadline = time.perf_counter() + sample_seconds
+    for index, arg in enumerate(islice(args, sample_size)):
+        start, start_cpu = time.perf_counter_ns(), time.thread_time_ns()
+        try:
+            result = Result(index, arg, value=target(*arg.args, **arg.kwargs))
+        except Exception as e:
+            result = Result(index, arg, exception=e)
+        wall += time.perf_counter_ns() - start
+        cpu += time.thread_time_ns() - start_cpu
+        results.append(result)
+        if not result.ok and (fail_fast or not capture):
+            return tuple(results) if capture else result.get()
+        if time.perf_counter() > deadline:
+            break
+    sample = len(results)
+    if sample == 0:
+        return ()
+    plan = BatchPlan.choose(wall / sample / 1e9, cpu / sample / 1e9, sample,
+                            rest=None if total is None else total - sample, cpus=os.cpu_count() or 1,
+                            picklable=partial(_picklable, target), max_workers=max_workers)
+    if report is None:
+        getLogger(__name__).info(f'run_batch: {plan}')
+    else:
+        report(plan)
+
+    if plan.mode == 'threads':
+        rest = run_threads(target, args, max_workers=plan.max_workers, capture=capture, fail_fast=fail_fast)
+    elif plan.mode == 'processes':
+        rest = run_processes(target, args, max_workers=plan.max_workers, chunksize=plan.chunksize, capture=capture,
+                             fail_fast=fail_fast)
+    else:
+        rest = []
+        for index, arg in enumerate(args):
+            try:
+                rest.append(Result(index, arg, value=target(*arg.args, **arg.kwargs)))
+            except Exception as e:
+                if not capture:
+                    raise
+                rest.append(Result(index, arg, exception=e))
+                if fail_fast:
+                    break
+        rest = tuple(rest) if capture else tuple(r.value for r in rest)
+    if not capture:
+        return tuple(r.value for r in results) + rest
+    for result in rest:
+        result.index += sample
+    return tuple(results) + rest
+
+
+def _compute(n: int) -> int:
+    end = time.perf_counter() + .002
+    while time.perf_counter() < end:
+        pass
+    return n
+
+
+class _Waiter:
+    pickled = 0
+
+    def __reduce__(self):
+        _Waiter.pickled += 1
+        return _Waiter, ()
+
+    def wait(self, x: int) -> int:
+        time.sleep(.01)
+        if x == 10:
+            raise ValueError(x)
+        return x
+
+
+class TestBatch(TestCase):
+    def test_choose(self):
+        self.assertEqual(BatchPlan.choose(1e-6, 1e-6, 8).mode, 'inline')
+        self.assertEqual(BatchPlan.choose(1e-3, 1e-3, 8, rest=10, cpus=8).mode, 'inline')
+        self.assertEqual(BatchPlan.choose(.1, 1e-4, 8, cpus=8).mode, 'threads')
+        self.assertEqual(BatchPlan.choose(1e-3, 1e-3, 8, cpus=1).mode, 'inline')
+        self.assertEqual(BatchPlan.choose(1e-3, 1e-3, 8, cpus=4, picklable=False).mode, 'inline')
+        plan = BatchPlan.choose(1e-3, 1e-3, 8, rest=10000, cpus=4)
+        self.assertEqual((plan.mode, plan.max_workers, plan.chunksize), ('processes', 4, 20))
+        self.assertEqual(BatchPlan.choose(1e-3, 1e-3, 8, rest=100, cpus=4).chunksize, 6)
+        self.assertIn('processes (workers: 4, chunksize: 20)', str(plan))
+
+    def test_inline(self):
+        plans = []
+        self.assertEqual(run_batch(abs, (Arguments(-i) for i in range(1000)), report=plans.append),
+                         tuple(range(1000)))
+        self.assertEqual(plans[0].mode, 'inline')
+
+    def test_threads(self):
+        plans = []
+        start = time.perf_counter()
+        self.assertEqual(run_batch(time.sleep, [Arguments(.05)] * 40, report=plans.append), (None,) * 40)
+        self.assertEqual(plans[0].mode, 'threads')
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_cpu_bound(self):
+        plans = []
+        self.assertEqual(run_batch(_compute, [Arguments(i) for i in range(100)], report=plans.append),
+                         tuple(range(100)))
+        self.assertEqual(plans[0].mode, 'processes' if (os.cpu_count() or 1) > 1 else 'inline')
+
+    def test_exceptions(self):
+        self.assertRaises(ZeroDivisionError, run_batch, lambda x: 1 / x, [Arguments(i) for i in range(-20, 5)])
+        self.assertRaises(ZeroDivisionError, run_batch, lambda x: 1 / x, [Arguments(i) for i in range(1, -5, -1)])
+        results = run_batch(lambda x: 1 / x, [Arguments(i) for i in range(-20, 5)], capture=True)
+        self.assertEqual([r.index for r in results if not r.ok], [20])
+        self.assertEqual(len(run_batch(lambda x: 1 / x, [Arguments(i) for i in range(-20, 5)], capture=True,
+                                       fail_fast=True)), 21)
+
+
+    def test_first_error(self):
+        waiter, calls = _Waiter(), []
+
+        def _call(x: int) -> int:
+            calls.append(x)
+            return waiter.wait(x)
+
+        with self.assertRaises(ValueError):
+            run_batch(_call, [Arguments(i) for i in range(500)], max_workers=4)
+        self.assertLess(len(calls), 500)
+        self.assertEqual(len(run_batch(_call, [Arguments(i) for i in range(40)], capture=True)), 40)
+
+    def test_pickle_only_cpu_bound(self):
+        _Waiter.pickled = 0
+        plans = []
+        self.assertEqual(run_batch(_Waiter().wait, (Arguments(i) for i in range(10)), report=plans.append),
+                         tuple(range(10)))
+        self.assertEqual(plans[0].mode, 'threads')
+        self.assertEqual(_Waiter.pickled, 0)
+
+
+if __name__ == '__main__':
+    main(verbosity=2)
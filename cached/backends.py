@@ -0,0 +1,373 @@
+from hashlib import blake2b
+import mmap
+from multiprocessing import Process, resource_tracker, shared_memory
+import os
+from pathlib import Path
+import struct
+from threading import Lock
+import time
+from typing import Any, Tuple
+from unittest import main, TestCase
+from zlib import crc32
+
+try:
+    import fcntl
+except ImportError:  # not a posix platform: the on-disk store is guarded by the in-process lock only
+    fcntl = None
+
+
+missing = object()
+
+_NONE, _FALSE, _TRUE, _INT, _BIGINT, _FLOAT, _BYTES, _STR = range(8)
+_int = struct.Struct('<q')
+_float = struct.Struct('<d')
+
+
+def encode(value: Any) -> Tuple[int, bytes] | None:
+    """ pickle-free encoding of None, bool, int, float, bytes and str, None for anything else """
+    if value is None:
+        return _NONE, b''
+    if value is True or value is False:
+        return (_TRUE if value else _FALSE), b''
+    if type(value) is int:
+        if -2**63 <= value < 2**63:
+            return _INT, _int.pack(value)
+        return _BIGINT, str(value).encode()
+    if type(value) is float:
+        return _FLOAT, _float.pack(value)
+    if type(value) in (bytes, bytearray, memoryview):
+        return _BYTES, bytes(value)
+    if type(value) is str:
+        return _STR, value.encode()
+    return None
+
+
+def decode(code: int, data: bytes | memoryview) -> Any:
+    if code == _NONE:
+        return None
+    if code in (_FALSE, _TRUE):
+        return code == _TRUE
+    if code == _INT:
+        return _int.unpack(data)[0]
+    if code == _BIGINT:
+        return int(bytes(data))
+    if code == _FLOAT:
+        return _float.unpack(data)[0]
+    if code == _BYTES:
+        return bytes(data)
+    if code == _STR:
+        return str(data, 'utf-8')
+    raise ValueError(f'Unknown value code {code}')
+
+
+def make_key(*parts: Any) -> bytes | None:
+    """ stable cross-process key from encodable parts, None if any part is not encodable """
+    key = bytearray()
+    for part in parts:
+        encoded = encode(part)
+        if encoded is None:
+            return None
+        code, data = encoded
+        key += struct.pack('<BI', code, len(data))
+        key += data
+    return bytes(key)
+
+
+class CacheBackend:
+    """
+    Purpose:
+        storage shared by Cached instances, possibly across processes.
+        Cached._backend = None keeps values in instance slots only (the default).
+    """
+    def get(self, key: bytes, default: Any = missing) -> Any:
+        raise NotImplementedError('Implement get in class derived from CacheBackend')
+
+    def put(self, key: bytes, value: Any, ttl: float | None = None) -> bool:
+        raise NotImplementedError('Implement put in class derived from CacheBackend')
+
+    def delete(self, key: bytes) -> None:
+        raise NotImplementedError('Implement delete in class derived from CacheBackend')
+
+    def clear(self) -> None:
+        raise NotImplementedError('Implement clear in class derived from CacheBackend')
+
+
+class _Table(CacheBackend):
+    """
+    Fixed-size open-addressing hash table over a byte buffer.
+    Each record holds one key and value (record_size bytes at most, larger values are not stored).
+    A full probe window evicts the expired or least recently used record.
+    Records carry a crc32 of their content, so a torn write by another process reads as a miss.
+    """
+    _magic = b'PUCT'
+    _header = struct.Struct('<4sII')
+    # state, crc, key hash, expires, last used, value code, key length, value length
+    _record = struct.Struct('<BIQddBHI')
+    _stamp = struct.calcsize('<BIQd')
+    _empty, _used = 0, 1
+    probes = 8
+
+    def __init__(self, buffer: memoryview, capacity: int, record_size: int, create: bool):
+        if record_size <= self._record.size:
+            raise ValueError(f'Record size must exceed {self._record.size} bytes, got {record_size}')
+        self._buf = buffer
+        self._lock = Lock()
+        if create:
+            self._header.pack_into(self._buf, 0, self._magic, capacity, record_size)
+        magic, self.capacity, self.record_size = self._header.unpack_from(self._buf, 0)
+        if magic != self._magic:
+            raise ValueError('Buffer does not hold a cache table')
+
+    @staticmethod
+    def size(capacity: int, record_size: int) -> int:
+        return _Table._header.size + capacity * record_size
+
+    def _offset(self, index: int) -> int:
+        return self._header.size + index * self.record_size
+
+    def _window(self, key_hash: int):
+        start = key_hash % self.capacity
+        for i in range(min(self.probes, self.capacity)):
+            yield self._offset((start + i) % self.capacity)
+
+    def _read(self, offset: int, key: bytes, key_hash: int) -> Tuple[int, memoryview] | None:
+        state, crc, h, expires, _, code, klen, vlen = self._record.unpack_from(self._buf, offset)
+        if state != self._used or h != key_hash or klen != len(key):
+            return None
+        body = offset + self._record.size
+        data = self._buf[body:body + klen + vlen]
+        if len(data) != klen + vlen or crc32(data) != crc or data[:klen] != key:
+            return None
+        if expires and expires < time.time():
+            return None
+        return code, data[klen:]
+
+    def _lock_write(self):
+        return self._lock
+
+    def get(self, key: bytes, default: Any = missing) -> Any:
+        key_hash = _hash(key)
+        for offset in self._window(key_hash):
+            found = self._read(offset, key, key_hash)
+            if found is not None:
+                _float.pack_into(self._buf, offset + self._stamp, time.time())
+                return decode(*found)
+        return default
+
+    def put(self, key: bytes, value: Any, ttl: float | None = None) -> bool:
+        encoded = encode(value)
+        if encoded is None:
+            return False
+        code, data = encoded
+        if self._record.size + len(key) + len(data) > self.record_size:
+            return False
+        key_hash = _hash(key)
+        now = time.time()
+        with self._lock_write():
+            target, oldest = None, None
+            for offset in self._window(key_hash):
+                state, _, h, expires, used, *_ = self._record.unpack_from(self._buf, offset)
+                if state != self._used or h == key_hash or (expires and expires < now):
+                    target = offset
+                    break
+                if oldest is None or used < oldest[0]:
+                    oldest = (used, offset)
+            if target is None:
+                target = oldest[1]
+            body = key + data
+            self._buf[target] = self._empty
+            self._buf[target + self._record.size:target + self._record.size + len(body)] = body
+            self._record.pack_into(self._buf, target, self._used, crc32(body), key_hash,
+                                   now + ttl if ttl else 0., now, code, len(key), len(data))
+        return True
+
+    def delete(self, key: bytes) -> None:
+        key_hash = _hash(key)
+        with self._lock_write():
+            for offset in self._window(key_hash):
+                if self._read(offset, key, key_hash) is not None:
+                    self._buf[offset] = self._empty
+
+    def clear(self) -> None:
+        with self._lock_write():
+            for i in range(self.capacity):
+                self._buf[self._offset(i)] = self._empty
+
+    def __len__(self):
+        now = time.time()
+        count = 0
+        for i in range(self.capacity):
+            state, _, _, expires, *_ = self._record.unpack_from(self._buf, self._offset(i))
+            count += state == self._used and not (expires and expires < now)
+        return count
+
+
+def _hash(key: bytes) -> int:
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+
+class SharedMemoryBackend(_Table):
+    """
+    Purpose:
+        cache shared by processes of one host through a named shared memory segment.
+        The first process creates the segment, later ones attach to it and start warm.
+        The segment outlives every process using it (including its creator) until unlink() is called,
+        e.g. by the deployment that starts the workers, so the workers never split between two segments.
+        Writes are locked within a process only: concurrent writers in different processes may tear a record,
+        which its crc then turns into a miss.
+    Usage:
+    class Model(Cached):
+        _backend = SharedMemoryBackend('model_cache', capacity=65536)
+    """
+    def __init__(self, name: str, capacity: int = 4096, record_size: int = 256):
+        try:
+            self._shm = shared_memory.SharedMemory(name, create=True, size=self.size(capacity, record_size))
+            create = True
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name)
+            create = False
+        # the segment is not owned by this process: do not let the resource tracker unlink it on exit
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        super().__init__(self._shm.buf, capacity, record_size, create)
+
+    def close(self):
+        """ detach this process, the segment stays """
+        self._buf.release()
+        self._shm.close()
+
+    def unlink(self):
+        """ remove the segment: processes attached keep it until they close, later ones create a new one """
+        # SharedMemory.unlink unregisters the name, which must be registered for that
+        resource_tracker.register(self._shm._name, 'shared_memory')
+        self._shm.unlink()
+
+
+class MmapBackend(_Table):
+    """
+    Purpose:
+        cache kept in a memory-mapped file, shared by processes and surviving restarts.
+        Writers lock the file with flock where available.
+    """
+    def __init__(self, path: Path, capacity: int = 4096, record_size: int = 256):
+        self.path = Path(path)
+        size = self.size(capacity, record_size)
+        self._file = open(self.path, 'a+b')
+        self._file.seek(0, os.SEEK_END)
+        create = self._file.tell() == 0
+        if create:
+            self._file.truncate(size)
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        super().__init__(memoryview(self._mmap), capacity, record_size, create)
+
+    def _lock_write(self):
+        return _FileLock(self._lock, self._file)
+
+    def close(self):
+        self._buf.release()
+        self._mmap.close()
+        self._file.close()
+
+
+class _FileLock:
+    __slots__ = ('_lock', '_file')
+
+    def __init__(self, lock: Lock, file):
+        self._lock = lock
+        self._file = file
+
+    def __enter__(self):
+        self._lock.acquire()
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *args):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        self._lock.release()
+
+
+class CodecTest(TestCase):
+    def test_round_trip(self):
+        for value in (None, True, False, 0, -1, 2**70, 1.5, b'\x00\xff', 'юникод'):
+            code, data = encode(value)
+            self.assertEqual(decode(code, data), value)
+            self.assertIs(type(decode(code, data)), type(value))
+        self.assertIsNone(encode([1, 2]))
+        self.assertIsNone(make_key('a', [1]))
+        self.assertNotEqual(make_key('a', 1), make_key('a', '1'))
+
+
+class BackendTest(TestCase):
+    def _check(self, first: _Table, second: _Table):
+        key = make_key('Example', '_v2', 3)
+        self.assertIs(first.get(key), missing)
+        self.assertTrue(first.put(key, 9))
+        self.assertEqual(second.get(key), 9)
+        self.assertFalse(first.put(make_key('x'), [9]))
+        self.assertFalse(first.put(make_key('x'), b'.' * first.record_size))
+        first.delete(key)
+        self.assertIsNone(second.get(key, None))
+        first.put(key, 'short', ttl=.05)
+        self.assertEqual(second.get(key), 'short')
+        time.sleep(.1)
+        self.assertIs(second.get(key), missing)
+        for i in range(4 * first.capacity):
+            first.put(make_key(i), i)
+        self.assertLessEqual(len(second), first.capacity)
+        first.clear()
+        self.assertEqual(len(second), 0)
+
+    @staticmethod
+    def _child(name: str):
+        backend = SharedMemoryBackend(name)
+        backend.put(make_key('child'), backend.get(make_key('parent')) * 2)
+        backend.close()
+
+    @staticmethod
+    def _creator(name: str):
+        backend = SharedMemoryBackend(name, capacity=16, record_size=128)
+        backend.put(make_key('parent'), 21)
+        backend.close()
+
+    def test_shared_memory(self):
+        name = f'python_utils_test_{os.getpid()}'
+        backend = SharedMemoryBackend(name, capacity=16, record_size=128)
+        try:
+            self._check(backend, backend)
+            backend.put(make_key('parent'), 21)
+            child = Process(target=self._child, args=(name,))
+            child.start()
+            child.join()
+            self.assertEqual(backend.get(make_key('child')), 42)
+        finally:
+            backend.close()
+            backend.unlink()
+
+    def test_creator_exit(self):
+        name = f'python_utils_test_creator_{os.getpid()}'
+        creator = Process(target=self._creator, args=(name,))
+        creator.start()
+        creator.join()
+        time.sleep(.2)  # the resource tracker of the creator cleans up after it exits
+        backend = SharedMemoryBackend(name)
+        try:
+            self.assertEqual(backend.get(make_key('parent')), 21)
+        finally:
+            backend.close()
+            backend.unlink()
+
+    def test_mmap(self):
+        path = Path('test_cache.bin')
+        first = MmapBackend(path, capacity=16, record_size=128)
+        second = MmapBackend(path)
+        try:
+            self.assertEqual((second.capacity, second.record_size), (16, 128))
+            self._check(first, second)
+        finally:
+            second.close()
+            first.close()
+            path.unlink()
+
+
+if __name__ == '__main__':
+    main(verbosity=2)
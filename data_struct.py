@@ -1,25 +1,431 @@
-from typing import Any, Dict, Generator, List, Self
+from array import array
+from typing import Any, Callable, Dict, Generator, Iterable, Iterator, List, Self, TextIO
 import unittest
 import json
+import mmap
+import os
+import pickle
+import struct
 
 import yaml
 from pathlib import Path
+import sys
+from threading import get_ident, Lock
+import time
+
+try:
+    from yaml import CSafeLoader as _YamlLoader, CSafeDumper as _YamlDumper
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader, SafeDumper as _YamlDumper
+
+try:
+    import numpy as np
+except ImportError:  # numpy arrays are not supported by dump_binary
+    np = None
+
+
+# parsed files by (format, resolved path): (mtime_ns, size, pickled data)
+_parsed_files: Dict[tuple[str, Path], tuple[int, int, bytes]] = {}
+_parsed_files_lock = Lock()
+
+
+def _read_file(path: Path, kind: str, parse: Callable[[TextIO], Any], cache: bool) -> Any:
+    if not cache:
+        with open(path) as file:
+            return parse(file)
+    path = Path(path).resolve()
+    stat = path.stat()
+    entry = _parsed_files.get((kind, path))
+    if entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_size):
+        return pickle.loads(entry[2])
+    with open(path) as file:
+        data = parse(file)
+    with _parsed_files_lock:
+        # pickled, so that every reader unpickles its own copy (faster than json.load or a deep copy)
+        _parsed_files[(kind, path)] = (stat.st_mtime_ns, stat.st_size, pickle.dumps(data, pickle.HIGHEST_PROTOCOL))
+    return data
+
+
+def _yaml_load(file: TextIO) -> Any:
+    return yaml.load(file, _YamlLoader)
+
+
+Change = tuple[str, tuple[str, ...], Any]
+
+
+class _JsonStream:
+    """
+    Incremental reader of one JSON document: walks objects down to an array
+    and yields its elements one at a time, holding at most one element (or one skipped scalar) in memory.
+    """
+    _chunk = 1 << 16
+    _decoder = json.JSONDecoder()
+    _delimiters = frozenset(',:]} \t\r\n')
+
+    def __init__(self, file: TextIO):
+        self._file = file
+        self._buf = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self, size: int) -> bool:
+        if self._eof:
+            return False
+        chunk = self._file.read(size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in ' \t\r\n':
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill(self._chunk):
+                raise json.JSONDecodeError('Unexpected end of document', self._buf, self._pos)
+
+    def _expect(self, char: str):
+        if self._peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self._buf, self._pos)
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill(max(self._chunk, len(self._buf))):
+                    raise
+                continue
+            # a number may continue in the next chunk (e.g. cut after '.' or 'e'): it is complete only
+            # when a delimiter follows it or at the end of the document
+            if end < len(self._buf) and self._buf[end] in self._delimiters or not self._fill(self._chunk):
+                self._pos = end
+                return value
+
+    def _skip(self):
+        char = self._peek()
+        if char == '[':
+            for _ in self._array():
+                self._skip()
+        elif char == '{':
+            for _ in self._object():
+                self._skip()
+        else:
+            self._value()
+
+    def _array(self) -> Iterator[None]:
+        """ positions at each element in turn, the caller must consume it """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield
+            if self._peek() == ']':
+                self._pos += 1
+                return
+            self._expect(',')
+
+    def _object(self) -> Iterator[str]:
+        """ yields each key positioned at its value, the caller must consume it """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise json.JSONDecodeError('Expecting property name', self._buf, self._pos)
+            key = self._value()
+            self._expect(':')
+            yield key
+            if self._peek() == '}':
+                self._pos += 1
+                return
+            self._expect(',')
+
+    def elements(self, path: tuple[str, ...]) -> Iterator[Any]:
+        if path:
+            if self._peek() != '{':
+                raise TypeError(f'Cannot select {path[0]!r}: not an object')
+            for key in self._object():
+                if key != path[0]:
+                    self._skip()
+                    continue
+                yield from self.elements(path[1:])
+                return
+            raise KeyError(path[0])
+        if self._peek() != '[':
+            raise TypeError('Selected value is not an array')
+        for _ in self._array():
+            yield self._value()
+
+
+class _Binary:
+    """
+    Self-describing binary encoding of a value tree:
+    header (magic, version, byte order, tree length), tree, payloads (aligned).
+    Lists of only ints or only floats are packed. Bytes of out_of_band size or more, array.array and numpy arrays
+    are written to the payload section and referenced from the tree, to be read back as views of the mapped file.
+    """
+    magic = b'PUDS'
+    version = 1
+    header = struct.Struct('<4sBc2xQ')
+    align = 64
+    (NONE, FALSE, TRUE, INT, BIGINT, FLOAT, STR, BYTES, LIST, DICT,
+     INTS, FLOATS, BYTES_REF, ARRAY_REF, NDARRAY_REF) = range(15)
+    u8 = struct.Struct('<B')
+    u32 = struct.Struct('<I')
+    u64 = struct.Struct('<Q')
+    i64 = struct.Struct('<q')
+    f64 = struct.Struct('<d')
+    order = b'<' if sys.byteorder == 'little' else b'>'
+
+    def __init__(self, out_of_band: int):
+        self.out_of_band = out_of_band
+        self.tree = bytearray()
+        self.payloads: List[Any] = []
+        self.payload_size = 0
+
+    def _ref(self, data: Any):
+        """ appends data to the payloads (8-byte aligned) and its offset and size to the tree """
+        size = memoryview(data).nbytes
+        self.tree += self.u64.pack(self.payload_size) + self.u64.pack(size)
+        self.payloads.append(data)
+        if size % 8:
+            self.payloads.append(bytes(8 - size % 8))
+        self.payload_size += size + -size % 8
+
+    def _str(self, value: str):
+        data = value.encode()
+        self.tree += self.u32.pack(len(data))
+        self.tree += data
+
+    def encode(self, value: Any):
+        t = self.tree
+        if value is None:
+            t.append(self.NONE)
+        elif value is True or value is False:
+            t.append(self.TRUE if value else self.FALSE)
+        elif isinstance(value, int):
+            if -2**63 <= value < 2**63:
+                t.append(self.INT)
+                t += self.i64.pack(value)
+            else:
+                t.append(self.BIGINT)
+                self._str(str(value))
+        elif isinstance(value, float):
+            t.append(self.FLOAT)
+            t += self.f64.pack(value)
+        elif isinstance(value, str):
+            t.append(self.STR)
+            self._str(value)
+        elif isinstance(value, (bytes, bytearray, memoryview)):
+            if memoryview(value).nbytes >= self.out_of_band:
+                t.append(self.BYTES_REF)
+                self._ref(value)
+            else:
+                data = bytes(value)
+                t.append(self.BYTES)
+                t += self.u32.pack(len(data))
+                t += data
+        elif isinstance(value, (list, tuple)):
+            self._sequence(value)
+        elif isinstance(value, (dict, DataStruct)):
+            # through the class: a data key 'items' shadows the method on a DataStruct
+            items = DataStruct.items(value) if isinstance(value, DataStruct) else value.items()
+            t.append(self.DICT)
+            t += self.u32.pack(len(value.names) if isinstance(value, DataStruct) else len(value))
+            for k, v in items:
+                self._str(k)
+                self.encode(v)
+        elif isinstance(value, array):
+            t.append(self.ARRAY_REF)
+            t += value.typecode.encode()
+            self._ref(value)
+        elif np is not None and isinstance(value, np.ndarray) and not value.dtype.hasobject:
+            value = np.ascontiguousarray(value)
+            t.append(self.NDARRAY_REF)
+            dtype = value.dtype.str.encode()
+            t += self.u8.pack(len(dtype)) + dtype + self.u8.pack(value.ndim)
+            for n in value.shape:
+                t += self.u64.pack(n)
+            self._ref(value.reshape(-1).view(np.uint8))
+        else:
+            raise TypeError(f'Cannot encode {type(value).__name__} value to binary')
+
+    def _sequence(self, value: list | tuple):
+        t = self.tree
+        kinds = set(map(type, value))
+        if kinds == {float} or kinds == {int}:
+            try:
+                packed = array('d' if kinds == {float} else 'q', value)
+            except OverflowError:
+                pass
+            else:
+                t.append(self.FLOATS if kinds == {float} else self.INTS)
+                t += self.u32.pack(len(packed))
+                t += packed.tobytes()
+                return
+        t.append(self.LIST)
+        t += self.u32.pack(len(value))
+        for v in value:
+            self.encode(v)
+
+    def write(self, path: Path):
+        """
+        writes a temporary file next to path and renames it over path, so that views returned by read_binary
+        of the previous file keep its contents (rewriting it in place would change them or, if the file shrinks,
+        crash the process with SIGBUS on access)
+        """
+        path = Path(path)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{get_ident()}.tmp')
+        try:
+            with open(tmp, 'xb') as file:
+                file.write(self.header.pack(self.magic, self.version, self.order, len(self.tree)))
+                file.write(self.tree)
+                file.write(bytes(-(self.header.size + len(self.tree)) % self.align))
+                for payload in self.payloads:
+                    file.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+
+class _BinaryReader:
+    def __init__(self, buf: memoryview):
+        magic, version, order, tree_size = _Binary.header.unpack_from(buf, 0)
+        if magic != _Binary.magic or version != _Binary.version:
+            raise ValueError('Not a DataStruct binary file')
+        if order != _Binary.order:
+            raise ValueError(f'Binary file byte order {order} differs from the platform one')
+        self._buf = buf
+        self._pos = _Binary.header.size
+        end = self._pos + tree_size
+        self._base = end + -end % _Binary.align
+        self._decoders: tuple[Callable[[], Any], ...] = (
+            lambda: None, lambda: False, lambda: True, self._int, self._bigint, self._float, self._str,
+            self._bytes, self._list, self._dict, self._ints, self._floats, self._bytes_ref, self._array_ref,
+            self._ndarray_ref)
+
+    def _unpack(self, s: struct.Struct) -> Any:
+        value = s.unpack_from(self._buf, self._pos)[0]
+        self._pos += s.size
+        return value
+
+    def _slice(self, size: int) -> memoryview:
+        view = self._buf[self._pos:self._pos + size]
+        self._pos += size
+        return view
+
+    def _ref(self) -> memoryview:
+        offset = self._base + self._unpack(_Binary.u64)
+        return self._buf[offset:offset + self._unpack(_Binary.u64)]
+
+    def value(self) -> Any:
+        tag = self._buf[self._pos]
+        self._pos += 1
+        return self._decoders[tag]()
+
+    def _int(self) -> int:
+        return self._unpack(_Binary.i64)
+
+    def _bigint(self) -> int:
+        return int(self._str())
+
+    def _float(self) -> float:
+        return self._unpack(_Binary.f64)
+
+    def _str(self) -> str:
+        return str(self._slice(self._unpack(_Binary.u32)), 'utf-8')
+
+    def _bytes(self) -> bytes:
+        return bytes(self._slice(self._unpack(_Binary.u32)))
+
+    def _list(self) -> list:
+        return [self.value() for _ in range(self._unpack(_Binary.u32))]
+
+    def _dict(self) -> dict:
+        count = self._unpack(_Binary.u32)
+        data = {}
+        for _ in range(count):
+            key = self._str()
+            data[key] = self.value()
+        return data
+
+    def _packed(self, typecode: str) -> list:
+        packed = array(typecode)
+        packed.frombytes(self._slice(self._unpack(_Binary.u32) * packed.itemsize))
+        return packed.tolist()
+
+    def _ints(self) -> list:
+        return self._packed('q')
+
+    def _floats(self) -> list:
+        return self._packed('d')
+
+    def _bytes_ref(self) -> memoryview:
+        return self._ref()
+
+    def _array_ref(self) -> memoryview:
+        typecode = chr(self._buf[self._pos])
+        self._pos += 1
+        return self._ref().cast(typecode)
+
+    def _ndarray_ref(self) -> Any:
+        dtype = str(self._slice(self._unpack(_Binary.u8)), 'ascii')
+        shape = tuple(self._unpack(_Binary.u64) for _ in range(self._unpack(_Binary.u8)))
+        data = self._ref()
+        if np is None:
+            return data
+        return np.frombuffer(data, dtype=dtype).reshape(shape)
 
 
 class DataStruct:
-    def __init__(self, data: Dict[str, Any]):
+    """
+    Attribute access to a (nested) dict.
+    With lazy=True the raw dict is kept and values (nested DataStructs included) are created on first access
+    and cached as attributes; dict() and dump_* then return untouched subtrees as they are, without walking them
+    (those subtrees are shared with the raw dict, not copied).
+    """
+    def __init__(self, data: Dict[str, Any], *, lazy: bool = False):
         self.__names: List[str] = [k for k in data.keys()]
+        self.__raw: Dict[str, Any] | None = data if lazy else None
+        if lazy:
+            return
         for k, v in data.items():
             if isinstance(v, dict):
                 self.__setattr__(k, DataStruct(v))
             else:
                 self.__setattr__(k, v)
 
+    def __getattr__(self, key: str):
+        raw = self.__dict__.get('_DataStruct__raw')
+        if raw is None or key not in raw:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{key}'")
+        value = raw[key]
+        if isinstance(value, dict):
+            value = DataStruct(value, lazy=True)
+        self.__setattr__(key, value)
+        return value
+
     def __contains__(self, key: str):
         return key in self.__names
 
     def __getitem__(self, key: str):
-        return self.__getattribute__(key)
+        # data keys named like methods (items, dict, diff...) are shadowed by them for getattr
+        # until materialised, so the instance and the raw data are checked first
+        if key in self.__dict__:
+            return self.__dict__[key]
+        if self.__raw is not None and key in self.__raw:
+            return self.__getattr__(key)
+        return getattr(self, key)
 
     def __str__(self):
         return '<' + ', '.join(f'{key}: {self[key]}' for key in self.__names) + '>'
@@ -31,10 +437,18 @@ class DataStruct:
     def names(self) -> tuple[str, ...]:
         return tuple(self.__names)
 
+    def is_lazy(self) -> bool:
+        return self.__raw is not None
+
     def dict(self) -> Dict[str, Any]:
         data = {}
         for key in self.__names:
-            data[key] = self[key].dict() if isinstance(self[key], DataStruct) else self[key]
+            if self.__raw is not None and key not in self.__dict__:
+                data[key] = self.__raw[key]
+            else:
+                value = self[key]
+                # through the class: a data key 'dict' shadows the method on the instance
+                data[key] = type(value).dict(value) if isinstance(value, DataStruct) else value
         return data
 
     def dump_json(self, path: Path):
@@ -42,18 +456,72 @@ class DataStruct:
             json.dump(self.dict(), file)
 
     @classmethod
-    def read_json(cls, path: Path) -> Self:
+    def read_json(cls, path: Path, *, lazy: bool = False, cache: bool = False) -> Self:
+        """
+        cache: reuse the parsed data while the file mtime and size are unchanged;
+        each reader gets its own copy, so changes to one result do not leak into the others
+        """
+        return cls(_read_file(path, 'json', json.load, cache), lazy=lazy)
+
+    @classmethod
+    def iter_json(cls, path: Path, select: str = '', *, lazy: bool = False) -> Generator[Self, None, None]:
+        """
+        Streams records of a JSON array without loading the whole document.
+        select: dotted path to the array, e.g. 'data.items[*]' ('' - top-level array)
+        """
+        keys = tuple(k for k in select.removesuffix('[*]').split('.') if k)
+        with open(path) as file:
+            for record in _JsonStream(file).elements(keys):
+                yield cls._record(record, lazy)
+
+    @classmethod
+    def iter_jsonl(cls, path: Path, *, lazy: bool = False) -> Generator[Self, None, None]:
+        """ Streams records of a JSON Lines file, blank lines are skipped """
         with open(path) as file:
-            return cls(json.load(file))
+            for line in file:
+                if line.strip():
+                    yield cls._record(json.loads(line), lazy)
+
+    @classmethod
+    def _record(cls, data: Any, lazy: bool) -> Self:
+        if not isinstance(data, dict):
+            raise TypeError(f'Record is not an object: {str(data)[:80]}')
+        return cls(data, lazy=lazy)
+
+    def dump_binary(self, path: Path, *, out_of_band: int = 4096):
+        """
+        Compact binary dump (see read_binary). Supports None, bool, int, float, str, bytes, lists, tuples, dicts,
+        array.array and numpy arrays; bytes of out_of_band size or more are stored out of the value tree.
+        An existing file is replaced, not rewritten, so earlier read_binary results of it stay valid.
+        """
+        encoder = _Binary(out_of_band)
+        encoder.encode(self)
+        encoder.write(path)
+
+    @classmethod
+    def read_binary(cls, path: Path, *, lazy: bool = False) -> Self:
+        """
+        Reads a dump_binary file through mmap. Out-of-band values are not copied: bytes come back as read-only
+        memoryviews, array.array as memoryviews cast to its typecode and numpy arrays as read-only arrays,
+        all of them views of the mapped file. Tuples come back as lists.
+        """
+        with open(path, 'rb') as file:
+            buf = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(_BinaryReader(memoryview(buf)).value(), lazy=lazy)
 
     def dump_yaml(self, path: Path):
         with open(path, 'w') as file:
-            yaml.dump(self.dict(), file)
+            yaml.dump(self.dict(), file, _YamlDumper)
 
     @classmethod
-    def read_yaml(cls, path: Path) -> Self:
-        with open(path) as file:
-            return cls(yaml.load(file, yaml.Loader))
+    def read_yaml(cls, path: Path, *, lazy: bool = False, cache: bool = False) -> Self:
+        """ safe loader (libyaml based if available), cache: same as in read_json """
+        return cls(_read_file(path, 'yaml', _yaml_load, cache), lazy=lazy)
+
+    @staticmethod
+    def clear_file_cache():
+        with _parsed_files_lock:
+            _parsed_files.clear()
 
     def items(self) -> Generator[tuple[str, Any], None, None]:
         for name in self.__names:
@@ -62,6 +530,247 @@ class DataStruct:
     def __hash__(self):
         return hash(str(self))
 
+    def freeze(self) -> 'FrozenDataStruct':
+        return FrozenDataStruct(self.dict())
+
+    def diff(self, other: Self, _path: tuple[str, ...] = ()) -> List[Change]:
+        """
+        Changes turning self into other: ('set', key path, new value) for added and changed keys,
+        ('delete', key path, None) for removed ones. Nested DataStructs are compared key by key.
+        """
+        changes: List[Change] = []
+        for key in self.__names:
+            if key not in other:
+                changes.append(('delete', _path + (key,), None))
+                continue
+            mine, theirs = self[key], other[key]
+            # methods are called through the class: data keys (items, dict, diff...) shadow them on instances
+            if isinstance(mine, DataStruct) and isinstance(theirs, DataStruct):
+                changes.extend(DataStruct.diff(mine, theirs, _path + (key,)))
+            elif mine is not theirs and (type(mine) is not type(theirs) or mine != theirs):
+                changes.append(('set', _path + (key,), _plain(theirs)))
+        for key in other.names:
+            if key not in self:
+                changes.append(('set', _path + (key,), _plain(other[key])))
+        return changes
+
+    def patch(self, changes: Iterable[Change]) -> Self:
+        """ applies diff() changes in place, dict values become DataStructs """
+        for op, path, value in changes:
+            node = self
+            for key in path[:-1]:
+                node = node[key]
+            if op == 'set':
+                node.__set(path[-1], value)
+            elif op == 'delete':
+                node.__delete(path[-1])
+            else:
+                raise ValueError(f'Unknown change {op} of {".".join(path)}')
+        return self
+
+    def __set(self, key: str, value: Any):
+        if isinstance(value, dict):
+            value = DataStruct(value, lazy=self.__raw is not None)
+        self.__setattr__(key, value)  # raises for a FrozenDataStruct
+        if key not in self.__names:
+            self.__names.append(key)
+
+    def __delete(self, key: str):
+        if key not in self.__names:
+            raise KeyError(key)
+        if key in self.__dict__:
+            self.__delattr__(key)  # raises for a FrozenDataStruct
+        self.__names.remove(key)
+        if self.__raw is not None and key in self.__raw:
+            self.__raw = {k: v for k, v in self.__raw.items() if k != key}
+
+
+def _plain(value: Any) -> Any:
+    return type(value).dict(value) if isinstance(value, DataStruct) else value
+
+
+class DataStructWatcher:
+    """
+    Purpose:
+        keep a DataStruct in sync with its JSON or YAML file.
+        poll() rereads the file when its mtime or size changes, patches `data` in place
+        and returns the changed key paths.
+    Usage:
+    watcher = DataStructWatcher(Path('config.yaml'))
+    config = watcher.data
+    ...
+    for path in watcher.poll():
+        reconfigure(path)
+    """
+    _readers = {'.json': DataStruct.read_json, '.yaml': DataStruct.read_yaml, '.yml': DataStruct.read_yaml}
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        if self.path.suffix not in self._readers:
+            raise ValueError(f'Cannot watch {self.path}: unknown format')
+        self._stamp = self._stat()
+        self.data: DataStruct = self._read()
+
+    def _stat(self) -> tuple[int, int]:
+        stat = self.path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> DataStruct:
+        return self._readers[self.path.suffix](self.path)
+
+    def poll(self) -> List[tuple[str, ...]]:
+        stamp = self._stat()
+        if stamp == self._stamp:
+            return []
+        data = self._read()  # a file caught mid-write fails here and is reread at the next poll
+        self._stamp = stamp
+        changes = DataStruct.diff(self.data, data)
+        DataStruct.patch(self.data, changes)
+        return [path for _, path, _ in changes]
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return FrozenDataStruct(value)
+    if isinstance(value, DataStruct):
+        return value if isinstance(value, FrozenDataStruct) else FrozenDataStruct(DataStruct.dict(value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, FrozenDataStruct):
+        return FrozenDataStruct.dict(value)
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    if isinstance(value, frozenset):
+        return set(value)
+    return value
+
+
+class FrozenDataStruct(DataStruct):
+    """
+    Immutable DataStruct: nested dicts become FrozenDataStructs, lists - tuples, sets - frozensets.
+    The structural hash is computed once at construction. Equality short-circuits on identity,
+    then on the hash and then compares values key by key, stopping at the first difference.
+    dict() (and so dump_json / dump_yaml) turns tuples and frozensets back into lists and sets.
+    """
+    def __init__(self, data: Dict[str, Any], *, lazy: bool = False):
+        """ lazy: accepted for the inherited readers, a frozen struct is built whole to be hashed """
+        if lazy:
+            raise ValueError(f'{self.__class__.__name__} cannot be lazy')
+        frozen = {k: _freeze(v) for k, v in data.items()}
+        super().__init__(frozen)
+        object.__setattr__(self, '_FrozenDataStruct__hash', hash(frozenset(frozen.items())))
+
+    def __setattr__(self, key: str, value: Any):
+        if '_FrozenDataStruct__hash' in self.__dict__:
+            raise AttributeError(f'Attempt to set attribute {key} of {self.__class__.__name__}')
+        super().__setattr__(key, value)
+
+    def __delattr__(self, key: str):
+        raise AttributeError(f'Attempt to delete attribute {key} of {self.__class__.__name__}')
+
+    def __hash__(self):
+        return self.__hash
+
+    def __eq__(self, other: DataStruct):
+        if self is other:
+            return True
+        if not isinstance(other, FrozenDataStruct):
+            return isinstance(other, DataStruct) and self == DataStruct.freeze(other)
+        if self.__hash != other.__hash or len(self.names) != len(other.names):
+            return False
+        for key in self.names:  # not items(): a data key 'items' shadows it
+            if key not in other or other[key] != self[key]:
+                return False
+        return True
+
+    def dict(self) -> Dict[str, Any]:
+        """ plain data again (lists and sets), as dump_json / dump_yaml take it """
+        return {key: _thaw(self[key]) for key in self.names}
+
+    def freeze(self) -> Self:
+        return self
+
+    def patch(self, changes: Iterable[Change]) -> Self:
+        raise AttributeError(f'Attempt to patch {self.__class__.__name__}')
+
+
+class Record:
+    """
+    Base of slotted record classes generated by record_type(): no per-instance __dict__ or names list,
+    the keys are shared by all records of the class. Supports [], in, items(), dict() and names as DataStruct.
+    """
+    __slots__ = ()
+    _fields: tuple[str, ...] = ()
+    _nested: Dict[str, type['Record']] = {}
+    # (key, slot setter, nested record class or None) per field
+    _setters: tuple[tuple[str, Callable, type['Record'] | None], ...] = ()
+
+    def __init__(self, data: Dict[str, Any]):
+        if len(data) != len(self._fields):
+            extra = set(data) - set(self._fields)
+            raise ValueError(f'{self.__class__.__name__} record: unexpected keys {extra}') if extra else \
+                KeyError(next(k for k in self._fields if k not in data))
+        for key, setter, nested in self._setters:
+            setter(self, data[key] if nested is None else nested(data[key]))
+
+    @classmethod
+    def from_dicts(cls, data: Iterable[Dict[str, Any]]) -> List[Self]:
+        return [cls(d) for d in data]
+
+    @classmethod
+    def read_jsonl(cls, path: Path) -> List[Self]:
+        with open(path) as file:
+            return [cls(json.loads(line)) for line in file if line.strip()]
+
+    def __contains__(self, key: str):
+        return key in self._fields
+
+    def __getitem__(self, key: str):
+        return getattr(self, key)
+
+    def __str__(self):
+        return '<' + ', '.join(f'{key}: {self[key]}' for key in self._fields) + '>'
+
+    def __eq__(self, other: 'Record | DataStruct'):
+        return self.dict() == other.dict()
+
+    def __hash__(self):
+        return hash(str(self))
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return self._fields
+
+    def dict(self) -> Dict[str, Any]:
+        return {key: self[key].dict() if key in self._nested else self[key] for key in self._fields}
+
+    def items(self) -> Generator[tuple[str, Any], None, None]:
+        for name in self._fields:
+            yield name, self[name]
+
+
+def record_type(sample: Dict[str, Any] | Iterable[str], name: str = 'Record') -> type[Record]:
+    """
+    Creates a Record class for records with the keys of sample (a key set or a sample record).
+    Nested dicts of a sample record get nested record classes.
+    """
+    fields = tuple(sample)
+    nested = {}
+    for key in fields:
+        if not key.isidentifier() or hasattr(Record, key):
+            raise ValueError(f'Invalid record field name {key!r}')
+        if isinstance(sample, dict) and isinstance(sample[key], dict):
+            nested[key] = record_type(sample[key], f'{name}_{key}')
+    cls = type(name, (Record,), {'__slots__': fields, '_fields': fields, '_nested': nested})
+    cls._setters = tuple((key, getattr(cls, key).__set__, nested.get(key)) for key in fields)
+    return cls
+
 
 class DataStructTest(unittest.TestCase):
     _d = {'a': 1, 'b': {'a': 2, 'b': [1, 2, 3]}}
@@ -112,5 +821,387 @@ class DataStructTest(unittest.TestCase):
         self.assertNotEqual(hash(self.ds), hash(DataStruct({})))
 
 
+class LazyDataStructTest(unittest.TestCase):
+    _d = {'a': 1, 'b': {'a': 2, 'b': [1, 2, 3], 'c': {'d': None}}}
+
+    def test_access(self):
+        ds = DataStruct(self._d, lazy=True)
+        self.assertTrue(ds.is_lazy())
+        self.assertEqual(ds.names, ('a', 'b'))
+        self.assertNotIn('b', vars(ds))
+        self.assertEqual(ds.b.a, 2)
+        self.assertIs(ds.b, ds['b'])
+        self.assertTrue(ds.b.is_lazy())
+        self.assertEqual(ds['b']['c'].d, None)
+        self.assertRaises(AttributeError, lambda x: x.c, ds)
+        self.assertRaises(AttributeError, lambda x, y: x[y], ds, 'c')
+        self.assertEqual(str(ds), str(DataStruct(self._d)))
+
+    def test_method_names(self):
+        d = {'data': {'items': [1, 2], 'dict': {'x': 1}, 'diff': 0}}
+        eager, lazy = DataStruct(d), DataStruct(d, lazy=True)
+        for key in ('items', 'dict', 'diff'):
+            self.assertEqual(lazy.data[key], eager.data[key], key)
+        self.assertEqual(lazy.data['items'], [1, 2])
+        self.assertEqual(str(lazy), str(eager))
+        self.assertEqual(lazy.dict(), d)
+
+    def test_dict(self):
+        ds = DataStruct(self._d, lazy=True)
+        self.assertIs(ds.dict()['b'], self._d['b'])
+        _ = ds.b.c
+        self.assertEqual(ds.dict(), self._d)
+        self.assertIsNot(ds.dict()['b'], self._d['b'])
+        self.assertIs(ds.dict()['b']['b'], self._d['b']['b'])
+
+    def test_eq(self):
+        self.assertEqual(DataStruct(self._d, lazy=True), DataStruct(self._d))
+        self.assertEqual(dict(DataStruct(self._d, lazy=True).items())['a'], 1)
+
+    def test_json(self):
+        path = Path('test_lazy.json')
+        DataStruct(self._d, lazy=True).dump_json(path)
+        ds = DataStruct.read_json(path, lazy=True)
+        self.assertTrue(ds.is_lazy())
+        self.assertEqual(ds, DataStruct(self._d))
+        path.unlink()
+
+
+class StreamDataStructTest(unittest.TestCase):
+    _records = [{'id': i, 'tags': ['x', 'y'], 'nested': {'v': i * 1.5, 's': 'q"\\]}'}} for i in range(50)]
+
+    def test_jsonl(self):
+        path = Path('test_stream.jsonl')
+        path.write_text('\n'.join(json.dumps(r) for r in self._records) + '\n\n')
+        self.assertEqual([ds.dict() for ds in DataStruct.iter_jsonl(path)], self._records)
+        path.unlink()
+
+    def test_array(self):
+        path = Path('test_stream.json')
+        path.write_text(json.dumps(self._records, indent=1))
+        self.assertEqual([ds.dict() for ds in DataStruct.iter_json(path)], self._records)
+        path.unlink()
+
+    def test_select(self):
+        path = Path('test_stream.json')
+        doc = {'meta': {'skip': [[1, 2], {'a': '[{'}], 'n': 123456789}, 'data': {'count': 50, 'items': self._records},
+               'tail': True}
+        path.write_text(json.dumps(doc))
+        _JsonStream._chunk, chunk = 7, _JsonStream._chunk
+        try:
+            self.assertEqual([ds.dict() for ds in DataStruct.iter_json(path, 'data.items[*]')], self._records)
+            self.assertEqual([ds.id for ds in DataStruct.iter_json(path, 'data.items', lazy=True)], list(range(50)))
+            self.assertRaises(KeyError, list, DataStruct.iter_json(path, 'data.missing[*]'))
+            self.assertRaises(TypeError, list, DataStruct.iter_json(path, 'data.count'))
+            self.assertRaises(TypeError, list, DataStruct.iter_json(path, 'meta.skip'))
+        finally:
+            _JsonStream._chunk = chunk
+            path.unlink()
+
+    def test_chunk_boundaries(self):
+        path = Path('test_stream.json')
+        numbers = [i * 1.25 for i in range(-50, 50)] + [1.5e-7, -2.25E+12, 3e5, 12345678901234567890, 0.0]
+        doc = {'skip': numbers, 'items': [{'v': v} for v in numbers]}
+        path.write_text(json.dumps(doc, separators=(',', ':')))
+        chunk = _JsonStream._chunk
+        try:
+            for size in range(1, 24):
+                _JsonStream._chunk = size
+                self.assertEqual([ds.v for ds in DataStruct.iter_json(path, 'items[*]')], numbers, size)
+        finally:
+            _JsonStream._chunk = chunk
+            path.unlink()
+
+
+class FrozenDataStructTest(unittest.TestCase):
+    _d = {'a': 1, 'b': {'a': 2, 'b': [1, {'c': 3}], 's': {1, 2}}}
+
+    def test_init(self):
+        fds = FrozenDataStruct(self._d)
+        self.assertEqual(fds.b.b, (1, FrozenDataStruct({'c': 3})))
+        self.assertIsInstance(fds.b, FrozenDataStruct)
+        self.assertEqual(fds.b.s, frozenset((1, 2)))
+        self.assertRaises(AttributeError, setattr, fds, 'a', 2)
+        self.assertRaises(AttributeError, setattr, fds.b, 'x', 2)
+        self.assertRaises(AttributeError, delattr, fds, 'a')
+        self.assertRaises(ValueError, FrozenDataStruct, self._d, lazy=True)
+
+    def test_items_key(self):
+        self.assertEqual(FrozenDataStruct({'items': [1], 'dict': 2}), FrozenDataStruct({'items': [1], 'dict': 2}))
+        self.assertNotEqual(FrozenDataStruct({'items': [1]}), FrozenDataStruct({'items': [2]}))
+
+    def test_dump(self):
+        fds = FrozenDataStruct(self._d)
+        self.assertEqual(fds.dict(), self._d)
+        self.assertEqual(DataStruct(self._d), fds)
+        path = Path('test_frozen.yaml')
+        try:
+            fds.dump_yaml(path)
+            self.assertEqual(FrozenDataStruct.read_yaml(path), fds)
+            FrozenDataStruct({'a': (1, FrozenDataStruct({'c': 3}))}).dump_json(path)
+            self.assertEqual(json.loads(path.read_text()), {'a': [1, {'c': 3}]})
+        finally:
+            path.unlink()
+
+    def test_read(self):
+        path = Path('test_frozen.json')
+        path.write_text(json.dumps(self._d | {'b': {'b': [1, 2]}}))
+        try:
+            fds = FrozenDataStruct.read_json(path)
+            self.assertIsInstance(fds, FrozenDataStruct)
+            self.assertEqual(fds.b.b, (1, 2))
+            path.write_text(json.dumps([{'a': 1}, {'a': 2}]))
+            self.assertEqual(list(FrozenDataStruct.iter_json(path)), [FrozenDataStruct({'a': 1}),
+                                                                      FrozenDataStruct({'a': 2})])
+        finally:
+            path.unlink()
+
+    def test_hash(self):
+        fds = FrozenDataStruct(self._d)
+        self.assertEqual(hash(fds), hash(FrozenDataStruct(self._d)))
+        self.assertEqual(hash(fds), hash(FrozenDataStruct({'b': self._d['b'], 'a': 1})))
+        self.assertEqual(len({fds, FrozenDataStruct(self._d), FrozenDataStruct({'a': 1})}), 2)
+
+    def test_eq(self):
+        fds = FrozenDataStruct(self._d)
+        self.assertTrue(fds == fds)
+        self.assertTrue(fds == FrozenDataStruct(self._d))
+        self.assertTrue(fds == DataStruct(self._d))
+        self.assertTrue(fds == DataStruct(self._d).freeze())
+        self.assertTrue(fds != FrozenDataStruct({'a': 1}))
+        self.assertTrue(fds != FrozenDataStruct({'a': 1, 'b': {'a': 3}}))
+        self.assertFalse(fds == 1)
+
+
+class RecordTest(unittest.TestCase):
+    _d = {'a': 1, 'b': {'a': 2, 'b': [1, 2, 3]}}
+
+    def test_record(self):
+        T = record_type(self._d, 'T')
+        r = T(self._d)
+        self.assertEqual(r.names, ('a', 'b'))
+        self.assertEqual(r.b.names, ('a', 'b'))
+        self.assertEqual((r.a, r['b'].a), (1, 2))
+        self.assertTrue('a' in r and 'c' not in r)
+        self.assertEqual(dict(r.items())['a'], 1)
+        self.assertEqual(r.dict(), self._d)
+        self.assertEqual(str(r), str(DataStruct(self._d)))
+        self.assertTrue(r == DataStruct(self._d) and r == T(self._d))
+        self.assertFalse(hasattr(r, '__dict__'))
+        self.assertRaises(AttributeError, lambda x: x.c, r)
+
+    def test_schema(self):
+        T = record_type(('x', 'y'))
+        self.assertEqual(T({'x': 1, 'y': {'z': 2}}).y, {'z': 2})
+        self.assertRaises(KeyError, T, {'x': 1})
+        self.assertRaises(ValueError, T, {'x': 1, 'y': 2, 'z': 3})
+        self.assertRaises(ValueError, record_type, ('items',))
+        self.assertRaises(ValueError, record_type, ('a-b',))
+
+    def test_bulk(self):
+        T = record_type(self._d)
+        path = Path('test_records.jsonl')
+        path.write_text('\n'.join(json.dumps(self._d) for _ in range(3)))
+        self.assertEqual(T.read_jsonl(path), T.from_dicts([self._d] * 3))
+        path.unlink()
+
+
+class BinaryDataStructTest(unittest.TestCase):
+    _d = {'a': 1, 'b': {'a': 2.5, 'b': [1, 2, 3], 'c': [.5, 1.5], 'd': [1, 'x', None, True, [2**70]]},
+          'e': 'юникод', 'f': b'\x00\x01', 'g': False, 'h': -2**63, 'i': [], 'j': {}}
+
+    def test_round_trip(self):
+        path = Path('test.bin')
+        DataStruct(self._d).dump_binary(path)
+        self.assertEqual(DataStruct.read_binary(path).dict(), self._d)
+        self.assertEqual(DataStruct.read_binary(path, lazy=True), DataStruct(self._d))
+        DataStruct({'items': [1], 'b': {'items': 'x'}}).dump_binary(path)
+        self.assertEqual(DataStruct.read_binary(path).dict(), {'items': [1], 'b': {'items': 'x'}})
+        self.assertRaises(TypeError, DataStruct({'a': object()}).dump_binary, path)
+        path.write_bytes(b'not a binary dump')
+        self.assertRaises(ValueError, DataStruct.read_binary, path)
+        path.unlink()
+
+    def test_out_of_band(self):
+        path = Path('test.bin')
+        blob = bytes(range(256)) * 64
+        values = array('d', (i / 3 for i in range(1000)))
+        DataStruct({'blob': blob, 'small': b'abc', 'values': values, 'n': 1}).dump_binary(path, out_of_band=1024)
+        ds = DataStruct.read_binary(path)
+        self.assertIsInstance(ds.blob, memoryview)
+        self.assertEqual(ds.blob, blob)
+        self.assertEqual(ds.small, b'abc')
+        self.assertEqual(ds.values.format, 'd')
+        self.assertEqual(ds.values.tolist(), values.tolist())
+        if np is not None:
+            matrix = np.arange(12, dtype=np.int32).reshape(3, 4)
+            DataStruct({'m': matrix}).dump_binary(path)
+            self.assertTrue((DataStruct.read_binary(path).m == matrix).all())
+        del ds
+        path.unlink()
+
+    def test_overwrite(self):
+        path = Path('test.bin')
+        DataStruct({'blob': b'a' * 8192}).dump_binary(path)
+        ds = DataStruct.read_binary(path)
+        DataStruct({'blob': b'b' * 8192}).dump_binary(path)
+        self.assertEqual(bytes(ds.blob), b'a' * 8192)
+        DataStruct({'n': 1}).dump_binary(path)  # shorter: the old mapping must stay readable
+        self.assertEqual(bytes(ds.blob), b'a' * 8192)
+        self.assertEqual(DataStruct.read_binary(path).dict(), {'n': 1})
+        self.assertEqual([p for p in os.listdir('.') if p.startswith('.test.bin.')], [])
+        del ds
+        path.unlink()
+
+
+class DiffPatchTest(unittest.TestCase):
+    _old = {'a': 1, 'b': {'a': 2, 'b': [1, 2, 3], 'c': {'d': 4}}, 'x': 'gone'}
+    _new = {'a': 1, 'b': {'a': 3, 'b': [1, 2, 3], 'c': {'d': 4}, 'e': {'f': 5}}, 'y': True}
+
+    def test_diff(self):
+        changes = DataStruct(self._old).diff(DataStruct(self._new))
+        self.assertEqual(changes, [('set', ('b', 'a'), 3), ('set', ('b', 'e'), {'f': 5}),
+                                   ('delete', ('x',), None), ('set', ('y',), True)])
+        self.assertEqual(DataStruct(self._old).diff(DataStruct(self._old)), [])
+        self.assertEqual(DataStruct({'items': [1]}).diff(DataStruct({'items': [2], 'dict': {'diff': 1}})),
+                         [('set', ('items',), [2]), ('set', ('dict',), {'diff': 1})])
+        self.assertEqual(DataStruct.diff(DataStruct({'diff': {'a': 1}}), DataStruct({'diff': {'a': 2}})),
+                         [('set', ('diff', 'a'), 2)])
+        self.assertEqual(DataStruct({'a': 1}).diff(DataStruct({'a': True})), [('set', ('a',), True)])
+
+    def test_patch(self):
+        for lazy in (False, True):
+            ds = DataStruct(self._old, lazy=lazy)
+            b = ds.b
+            ds.patch(ds.diff(DataStruct(self._new)))
+            self.assertEqual(ds.dict(), self._new)
+            self.assertEqual(ds.names, ('a', 'b', 'y'))
+            self.assertIs(ds.b, b)
+            self.assertEqual(ds.b.e.f, 5)
+            self.assertRaises(AttributeError, lambda x: x.x, ds)
+        self.assertEqual(self._old['x'], 'gone')
+        self.assertRaises(ValueError, DataStruct({}).patch, [('move', ('a',), None)])
+        frozen = DataStruct(self._old).freeze()
+        self.assertRaises(AttributeError, frozen.patch, [('delete', ('a',), None)])
+        ds = DataStruct({'f': frozen})
+        self.assertRaises(AttributeError, ds.patch, [('delete', ('f', 'a'), None)])
+        self.assertRaises(AttributeError, ds.patch, [('set', ('f', 'z'), 1)])
+        self.assertEqual(ds.f.names, ('a', 'b', 'x'))
+        self.assertEqual(hash(ds.f), hash(DataStruct(self._old).freeze()))
+
+    def test_watcher(self):
+        path = Path('test_watch.json')
+        DataStruct(self._old).dump_json(path)
+        watcher = DataStructWatcher(path)
+        config = watcher.data
+        self.assertEqual(watcher.poll(), [])
+        DataStruct(self._new).dump_json(path)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+        self.assertEqual(watcher.poll(), [('b', 'a'), ('b', 'e'), ('x',), ('y',)])
+        self.assertIs(watcher.data, config)
+        self.assertEqual(config.dict(), self._new)
+        path.write_text('{"a": ')
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+        self.assertRaises(ValueError, watcher.poll)
+        self.assertRaises(ValueError, watcher.poll)
+        DataStruct(self._old).dump_json(path)
+        os.utime(path, ns=(time.time_ns(), time.time_ns() + 2 * 10**9))
+        self.assertEqual(watcher.poll(), [('b', 'a'), ('b', 'e'), ('y',), ('x',)])
+        self.assertEqual(config.dict(), self._old)
+        self.assertRaises(ValueError, DataStructWatcher, Path('test_all.py'))
+        path.unlink()
+
+
+class FileCacheTest(unittest.TestCase):
+    _d = {'a': 1, 'b': {'c': [1, 2]}}
+
+    def test_cache(self):
+        path = Path('test_cache.yaml')
+        DataStruct(self._d).dump_yaml(path)
+        first = DataStruct.read_yaml(path, cache=True)
+        self.assertEqual(first.dict(), self._d)
+        second = DataStruct.read_yaml(path, cache=True)
+        self.assertIn(('yaml', path.resolve()), _parsed_files)
+        self.assertIsNot(second.b.c, first.b.c)
+        first.b.c.append(3)
+        first.a = 0
+        self.assertEqual(DataStruct.read_yaml(path, cache=True).dict(), self._d)
+        self.assertIsNot(DataStruct.read_yaml(path).b.c, first.b.c)
+        DataStruct({'a': 2}).dump_yaml(path)
+        self.assertEqual(DataStruct.read_yaml(path, cache=True).dict(), {'a': 2})
+        DataStruct.clear_file_cache()
+        self.assertEqual(_parsed_files, {})
+        path.unlink()
+
+
+def _benchmark_codecs(records: int = 2000, repeat: int = 5):
+    """ yaml.Loader/Dumper (previous path) vs libyaml safe codecs vs the parsed-file cache """
+    data = {f'key{i}': {'id': i, 'name': f'name {i}', 'values': [i * .5, i * 2], 'flag': i % 2 == 0}
+            for i in range(records)}
+    path = Path('benchmark.yaml')
+
+    def _time(name: str, func: Callable):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        print(f'\t{name}: {(time.perf_counter() - start) / repeat * 1000:.2f} ms')
+
+    print(f'YAML, {records} records, libyaml: {_YamlLoader.__name__ == "CSafeLoader"}')
+    _time('dump yaml.Dumper', lambda: path.write_text(yaml.dump(data, Dumper=yaml.Dumper)))
+    _time(f'dump {_YamlDumper.__name__}', lambda: path.write_text(yaml.dump(data, Dumper=_YamlDumper)))
+    _time('read yaml.Loader', lambda: DataStruct(yaml.load(path.read_text(), yaml.Loader)))
+    _time(f'read {_YamlLoader.__name__}', lambda: DataStruct.read_yaml(path))
+    _time('read cached', lambda: DataStruct.read_yaml(path, cache=True))
+    _time('read cached, lazy', lambda: DataStruct.read_yaml(path, cache=True, lazy=True))
+    path.unlink()
+    DataStruct.clear_file_cache()
+
+
+def _benchmark_records(records: int = 100000):
+    """ memory per record and construction throughput: DataStruct vs record_type() classes """
+    import tracemalloc
+    data = [{'id': i, 'name': f'name {i}', 'value': i * .5, 'pos': {'x': i, 'y': -i}} for i in range(records)]
+    T = record_type(data[0])
+    print(f'Records, {records} items')
+    for name, build in (('DataStruct', lambda: [DataStruct(d) for d in data]), ('Record', lambda: T.from_dicts(data))):
+        start = time.perf_counter()
+        build()
+        duration = time.perf_counter() - start
+        tracemalloc.start()
+        built = build()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        print(f'\t{name}: {size / records:.0f} B/record, {records / duration:.0f} records/sec')
+        del built
+
+
+def _benchmark_binary(count: int = 20000, repeat: int = 3):
+    """ size, encode and decode time: dump_binary/read_binary vs json and yaml (libyaml if available) """
+    data = DataStruct({'meta': {'name': 'snapshot', 'step': 42},
+                       'samples': [i / 7 for i in range(count)], 'ids': list(range(count)),
+                       'records': [{'id': i, 'name': f'n{i}', 'ok': i % 3 == 0} for i in range(count // 10)]})
+    print(f'Binary, {count} samples')
+    for name, dump, read in (('json', DataStruct.dump_json, DataStruct.read_json),
+                             ('yaml', DataStruct.dump_yaml, DataStruct.read_yaml),
+                             ('binary', DataStruct.dump_binary, DataStruct.read_binary)):
+        path = Path(f'benchmark.{name}')
+        start = time.perf_counter()
+        for _ in range(repeat):
+            dump(data, path)
+        encode = (time.perf_counter() - start) / repeat
+        start = time.perf_counter()
+        for _ in range(repeat):
+            read(path)
+        decode = (time.perf_counter() - start) / repeat
+        print(f'\t{name}: {path.stat().st_size / 1024:.0f} KB, encode {encode * 1000:.1f} ms,'
+              f' decode {decode * 1000:.1f} ms')
+        path.unlink()
+
+
 if __name__ == '__main__':
-    unittest.main(verbosity=2)
+    if sys.argv[1:] == ['benchmark']:
+        _benchmark_codecs()
+        _benchmark_records()
+        _benchmark_binary()
+    else:
+        unittest.main(verbosity=2)
@@ -0,0 +1,234 @@
+from array import array
+import operator
+from typing import Any, Callable, Dict, Iterable, List, Self, Sequence
+import unittest
+
+from data_struct import DataStruct
+
+try:
+    import numpy as np
+except ImportError:  # columns are kept in array.array / list
+    np = None
+
+
+_operators: Dict[str, Callable[[Any, Any], Any]] = {
+    '==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+
+def _flatten(data: Dict[str, Any], prefix: str = '') -> Dict[str, Any]:
+    """ nested dicts to dotted field names, an empty one stays a value (row() restores the nesting) """
+    flat = {}
+    for key, value in data.items():
+        if '.' in key:
+            raise ValueError(f'Field name {key!r} contains ".", which separates nested fields')
+        if isinstance(value, DataStruct):
+            value = type(value).dict(value)
+        if isinstance(value, dict) and value:
+            flat.update(_flatten(value, f'{prefix}{key}.'))
+        else:
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def _column(values: List[Any]) -> Any:
+    types = set(map(type, values))
+    if np is not None:
+        # mixed types would be coerced (e.g. ints to strings), lists may be ragged
+        if not (len(types) == 1 and types <= {bool, int, float, str} or types == {int, float}):
+            return values
+        try:
+            column = np.asarray(values)
+        except (ValueError, OverflowError):
+            return values
+        return column if column.dtype.kind in 'biufU' and column.ndim == 1 else values
+    try:
+        if types == {bool}:
+            return array('b', values)
+        if types == {int}:
+            return array('q', values)
+        if types and types <= {int, float}:
+            return array('d', values)
+    except OverflowError:
+        pass
+    return values
+
+
+def _take(column: Any, indices: Sequence[int]) -> Any:
+    if np is not None and isinstance(column, np.ndarray):
+        return column[np.asarray(indices, dtype=np.intp)]
+    if isinstance(column, array):
+        return array(column.typecode, [column[i] for i in indices])
+    return [column[i] for i in indices]
+
+
+def _item(value: Any) -> Any:
+    return value.item() if np is not None and isinstance(value, np.generic) else value
+
+
+class DataStructTable:
+    """
+    Purpose:
+        columnar storage of many same-shape records (dicts or DataStructs).
+        Each field is a typed column: numpy array if numpy is installed, array.array otherwise
+        (list for non-numeric values without numpy). Nested dicts are flattened to dotted field names,
+        so record keys must not contain dots.
+    Usage:
+    table = DataStructTable(records)
+    big = table.where('value', '>', 10).sort('value', reverse=True)
+    totals = table.group_sum('kind', 'value')  # {kind: {'value': sum}}
+    first = big.row(0)  # DataStruct
+    """
+    def __init__(self, records: Iterable[Dict[str, Any] | DataStruct] = (), *,
+                 columns: Dict[str, Any] | None = None):
+        if columns is not None:
+            self._columns: Dict[str, Any] = columns
+            self._length: int = len(next(iter(columns.values()))) if columns else 0
+            return
+        values: Dict[str, List[Any]] = {}
+        length = 0
+        for record in records:
+            flat = _flatten(type(record).dict(record) if isinstance(record, DataStruct) else record)
+            if length == 0:
+                values = {k: [] for k in flat}
+            elif flat.keys() != values.keys():
+                raise ValueError(f'Record #{length} fields {tuple(flat)} differ from {tuple(values)}')
+            for key, value in flat.items():
+                values[key].append(value)
+            length += 1
+        self._columns = {k: _column(v) for k, v in values.items()}
+        self._length = length
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._columns
+
+    def __getitem__(self, name: str) -> Any:
+        return self._columns[name]
+
+    @property
+    def names(self) -> tuple[str, ...]:
+        return tuple(self._columns)
+
+    def row(self, index: int) -> DataStruct:
+        data: Dict[str, Any] = {}
+        for name, column in self._columns.items():
+            *path, key = name.split('.')
+            node = data
+            for part in path:
+                node = node.setdefault(part, {})
+            node[key] = _item(column[index])
+        return DataStruct(data)
+
+    def rows(self) -> Iterable[DataStruct]:
+        for i in range(self._length):
+            yield self.row(i)
+
+    def take(self, indices: Sequence[int]) -> Self:
+        return self.__class__(columns={k: _take(v, indices) for k, v in self._columns.items()})
+
+    def filter(self, mask: Sequence[bool]) -> Self:
+        if np is not None:
+            mask = np.asarray(mask, dtype=bool)
+            return self.__class__(columns={k: v[mask] if isinstance(v, np.ndarray) else _take(v, np.flatnonzero(mask))
+                                           for k, v in self._columns.items()})
+        return self.take([i for i, m in enumerate(mask) if m])
+
+    def mask(self, name: str, op: str, value: Any) -> Sequence[bool]:
+        """ op: one of ==, !=, <, <=, >, >=, in """
+        column = self._columns[name]
+        if np is not None and isinstance(column, np.ndarray):
+            return np.isin(column, list(value)) if op == 'in' else _operators[op](column, value)
+        if op == 'in':
+            value = set(value)
+            return [v in value for v in column]
+        compare = _operators[op]
+        return [compare(v, value) for v in column]
+
+    def where(self, name: str, op: str, value: Any) -> Self:
+        return self.filter(self.mask(name, op, value))
+
+    def select(self, *names: str) -> Self:
+        return self.__class__(columns={name: self._columns[name] for name in names})
+
+    def sort(self, name: str, *, reverse: bool = False) -> Self:
+        column = self._columns[name]
+        if np is not None and isinstance(column, np.ndarray):
+            if not reverse:
+                return self.take(np.argsort(column, kind='stable'))
+            # stable descending: ties keep their order, as with sorted(reverse=True)
+            order = np.argsort(column[::-1], kind='stable')[::-1]
+            return self.take(self._length - 1 - order)
+        return self.take(sorted(range(self._length), key=column.__getitem__, reverse=reverse))
+
+    def group_sum(self, by: str, *names: str) -> Dict[Any, Dict[str, Any]]:
+        keys = self._columns[by]
+        if np is not None and isinstance(keys, np.ndarray) and \
+                all(isinstance(self._columns[n], np.ndarray) for n in names):
+            groups, inverse = np.unique(keys, return_inverse=True)
+            sums = {}
+            for name in names:
+                column = self._columns[name]
+                # sums in the column dtype, bincount would turn large ints into inexact floats
+                sums[name] = np.zeros(len(groups), dtype=column.dtype if column.dtype.kind in 'iuf' else np.int64)
+                np.add.at(sums[name], inverse, column)
+            return {_item(g): {n: _item(sums[n][i]) for n in names} for i, g in enumerate(groups)}
+        result: Dict[Any, Dict[str, Any]] = {}
+        columns = [self._columns[n] for n in names]
+        for i, key in enumerate(keys):
+            totals = result.setdefault(key, dict.fromkeys(names, 0))
+            for name, column in zip(names, columns):
+                totals[name] += column[i]
+        return result
+
+
+class DataStructTableTest(unittest.TestCase):
+    _records = [{'id': i, 'kind': 'ab'[i % 2], 'value': i * 1.5, 'pos': {'x': i, 'y': -i}} for i in range(10)]
+    table = DataStructTable(_records)
+
+    def test_init(self):
+        self.assertEqual(len(self.table), 10)
+        self.assertEqual(self.table.names, ('id', 'kind', 'value', 'pos.x', 'pos.y'))
+        self.assertEqual(self.table.row(3), DataStruct(self._records[3]))
+        self.assertEqual(DataStructTable(DataStruct(r) for r in self._records).row(9).pos.y, -9)
+        self.assertEqual(len(DataStructTable()), 0)
+        self.assertRaises(ValueError, DataStructTable, [{'a': 1}, {'b': 1}])
+        self.assertRaises(ValueError, DataStructTable, [{'a.b': 1}])
+        self.assertRaises(ValueError, DataStructTable, [{'a': {'b.c': 1}}])
+        record = {'a': {'b': 1, 'c': {}}, 'd': {}}
+        self.assertEqual(DataStructTable([record, record]).row(1).dict(), record)
+        if np is None:
+            self.assertIsInstance(self.table['id'], array)
+            self.assertIsInstance(self.table['kind'], list)
+
+    def test_where(self):
+        t = self.table.where('value', '>', 6)
+        self.assertEqual([_item(i) for i in t['id']], [5, 6, 7, 8, 9])
+        self.assertEqual(len(self.table.where('kind', '==', 'a')), 5)
+        self.assertEqual(len(self.table.where('id', 'in', (1, 2, 42))), 2)
+        self.assertEqual(len(self.table.filter([True] * 3 + [False] * 7)), 3)
+
+    def test_select_sort(self):
+        t = self.table.select('id', 'pos.y').sort('pos.y')
+        self.assertEqual(t.names, ('id', 'pos.y'))
+        self.assertEqual(t.row(0).dict(), {'id': 9, 'pos': {'y': -9}})
+        self.assertEqual(self.table.sort('id', reverse=True).row(0).id, 9)
+        self.assertEqual([_item(i) for i in self.table.sort('kind', reverse=True)['id']],
+                         [1, 3, 5, 7, 9, 0, 2, 4, 6, 8])
+
+    def test_mixed(self):
+        table = DataStructTable([{'a': 1, 'l': [1, 2]}, {'a': 'x', 'l': [3]}])
+        self.assertEqual((table.row(0).a, table.row(1).a), (1, 'x'))
+        self.assertEqual(table.row(1).l, [3])
+
+    def test_group_sum(self):
+        self.assertEqual(self.table.group_sum('kind', 'id', 'value'),
+                         {'a': {'id': 20, 'value': 30.}, 'b': {'id': 25, 'value': 37.5}})
+        table = DataStructTable([{'k': 'a', 'v': 2 ** 60}, {'k': 'a', 'v': 1}])
+        self.assertEqual(table.group_sum('k', 'v'), {'a': {'v': 2 ** 60 + 1}})
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
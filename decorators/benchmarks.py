@@ -1,30 +1,42 @@
 import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from trace_export import TraceExporter
 
 
 def _time_str() -> str:
     return time.strftime('%X')
 
 
-def benchmark(name: str):
+def benchmark(name: str, exporter: 'TraceExporter | None' = None):
     def _benchmark(func):
         def wrapper(*args, **kwargs):
             print(f'<== {name} started at {_time_str()}')
-            start = time.time()
-            rv = func(*args, **kwargs)
-            print(f'==> {name} finished at {_time_str()}, duration: {time.time() - start:.1f} sec')
-            return rv
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                print(f'==> {name} finished at {_time_str()}, duration: {duration / 1e9:.1f} sec')
+                if exporter is not None:
+                    exporter.span(name, start, duration)
         return wrapper
     return _benchmark
 
 
-def async_benchmark(name: str):
+def async_benchmark(name: str, exporter: 'TraceExporter | None' = None):
     def _benchmark(async_func):
         async def wrapper(*args, **kwargs):
             print(f'<== {name} started at {_time_str()}')
-            start = time.time()
-            rv = await async_func(*args, **kwargs)
-            print(f'==> {name} finished at {_time_str()}, duration: {time.time() - start:.1f} sec')
-            return rv
+            start = time.perf_counter_ns()
+            try:
+                return await async_func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                print(f'==> {name} finished at {_time_str()}, duration: {duration / 1e9:.1f} sec')
+                if exporter is not None:
+                    exporter.span(name, start, duration)
         return wrapper
     return _benchmark
 
@@ -0,0 +1,368 @@
+from collections import deque
+from concurrent.futures import CancelledError, FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+from multiprocessing import resource_tracker, shared_memory
+import os
+from threading import Lock
+import time
+from traceback import format_exception
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Set, Tuple
+from unittest import main, skipIf, TestCase
+
+from thread import Arguments, Result
+
+try:
+    import numpy as np
+except ImportError:  # only bytes are passed through shared memory
+    np = None
+
+
+SHARED_MIN_SIZE = 1 << 16
+
+
+class _Shared:
+    """ bytes / numpy array copied to a shared memory segment, pickled instead of the data """
+    __slots__ = ('name', 'size', 'dtype', 'shape')
+
+    def __init__(self, name: str, size: int, dtype: str | None = None, shape: Tuple[int, ...] = ()):
+        self.name = name
+        self.size = size
+        self.dtype = dtype  # None - bytes
+        self.shape = shape
+
+
+class _RemoteTraceback(Exception):
+    """ set as __cause__ of an exception raised in a worker, which is pickled without its traceback """
+    def __init__(self, tb: str):
+        self.tb = tb
+
+    def __str__(self):
+        return self.tb
+
+
+def _share(value: Any) -> Tuple[Any, shared_memory.SharedMemory | None]:
+    if isinstance(value, (bytes, bytearray)) and len(value) >= SHARED_MIN_SIZE:
+        shared, data = _Shared('', len(value)), value
+    elif np is not None and isinstance(value, np.ndarray) and value.dtype != object and \
+            value.nbytes >= SHARED_MIN_SIZE:
+        data = np.ascontiguousarray(value)
+        shared = _Shared('', data.nbytes, data.dtype.str, data.shape)
+    else:
+        return value, None
+    shm = shared_memory.SharedMemory(create=True, size=shared.size)
+    shm.buf[:shared.size] = memoryview(data).cast('B')
+    shared.name = shm.name
+    return shared, shm
+
+
+def _attach(shared: _Shared, *, copy: bool = True,
+            unlink: bool = False) -> Tuple[Any, shared_memory.SharedMemory | None]:
+    """ copy=False: numpy arrays are views of the segment, which is returned to be closed after use """
+    shm = shared_memory.SharedMemory(shared.name)
+    if shared.dtype is None:
+        value = bytes(shm.buf[:shared.size])
+    else:
+        value = np.ndarray(shared.shape, dtype=shared.dtype, buffer=shm.buf)
+        if not copy:
+            value.flags.writeable = False
+            return value, shm
+        value = value.copy()
+    _close([shm], unlink)
+    return value, None
+
+
+def _close(segments: List[shared_memory.SharedMemory], unlink: bool = False):
+    for shm in segments:
+        try:
+            shm.close()
+        except BufferError:  # the target kept a view of an array, the mapping goes with it
+            pass
+        if unlink:
+            shm.unlink()
+
+
+def _run_chunk(target: Callable, chunk: List[Arguments],
+               fail_fast: bool) -> List[Tuple[Any, Exception | None, str]]:
+    """ in a worker process: [(value or _Shared, None, '') or (None, exception, formatted traceback)] """
+    results = []
+    for arg in chunk:
+        segments: List[shared_memory.SharedMemory] = []
+
+        def _open(value: Any) -> Any:
+            if not isinstance(value, _Shared):
+                return value
+            value, shm = _attach(value, copy=False)
+            if shm is not None:
+                segments.append(shm)
+            return value
+
+        try:
+            value = target(*map(_open, arg.args), **{k: _open(v) for k, v in arg.kwargs.items()})
+            value, shm = _share(value)
+            if shm is not None:
+                shm.close()  # the parent copies and unlinks it
+            results.append((value, None, ''))
+        except Exception as e:
+            tb = ''.join(format_exception(e))
+            e.__traceback__ = None  # drop the frames holding views of the segments
+            results.append((None, e, tb))
+            if fail_fast:
+                break
+        finally:
+            value = None
+            _close(segments)
+    return results
+
+
+_executor: ProcessPoolExecutor | None = None
+_executor_workers = 0
+_executor_calls = 0  # iter_processes calls in flight, the pool is not resized under them
+_executor_lock = Lock()
+
+
+def _pool(max_workers: int) -> ProcessPoolExecutor:
+    """ the shared pool, with _executor_lock held """
+    global _executor, _executor_workers
+    # a pool with a dead worker fails every later call, so it is replaced
+    if _executor is None or _executor._broken or _executor_workers < max_workers and not _executor_calls:
+        _shutdown()
+        # workers must report segments to the tracker of this process, so it is started before them
+        resource_tracker.ensure_running()
+        _executor, _executor_workers = ProcessPoolExecutor(max_workers), max_workers
+    return _executor
+
+
+def _shutdown():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def shutdown_processes():
+    """ stop the worker processes kept by run_processes / iter_processes """
+    with _executor_lock:
+        _shutdown()
+
+
+def iter_processes(target: Callable, args: Iterable[Arguments], *, max_workers: int | None = None,
+                   chunksize: int | None = None, ordered: bool = False, capture: bool = False,
+                   fail_fast: bool = False) -> Iterator[Any]:
+    """
+    Purpose:
+        iter_threads for CPU-bound targets: items are sent in chunks of `chunksize` to persistent worker
+        processes (kept between calls, see shutdown_processes), at most 2 * max_workers chunks at a time.
+        bytes and numpy arguments / results of SHARED_MIN_SIZE bytes or more go through shared memory instead
+        of the pipe; numpy arguments are read-only views of the segment, valid during the call.
+        target must be picklable (a module level function).
+        fail_fast=True: no more chunks are sent after the first exception and the running ones
+        stop at their first failed item (there is no cancelled() flag across processes).
+        If a worker dies, the items of every chunk in flight fail with BrokenProcessPool
+        (a Result each with capture=True) and the pool is replaced for the remaining items.
+        Concurrent calls share the pool: it grows to a larger max_workers only while no call uses it,
+        and a call on a larger pool keeps at most max_workers chunks in flight.
+    Usage:
+    features = run_processes(extract_features, (Arguments(image) for image in images))
+    """
+    global _executor_calls
+    max_workers = max_workers or os.cpu_count() or 1
+    if chunksize is None:
+        chunksize = max(1, len(args) // (4 * max_workers)) if hasattr(args, '__len__') else 16
+    args = iter(args)
+    submitted = 0
+    pending: Deque[Future] | Set[Future] = deque() if ordered else set()
+    chunks = {}  # future: (first index, chunk arguments, shared memory segments)
+    stop = False
+
+    def _submit(n: int):
+        nonlocal submitted
+        for _ in range(0 if stop else n):
+            chunk = list(islice(args, chunksize))
+            if not chunk:
+                return
+            segments = []
+            shared_chunk = []
+            for arg in chunk:
+                shared_args = []
+                for value in arg.args:
+                    value, shm = _share(value)
+                    shared_args.append(value)
+                    segments.append(shm)
+                shared_kwargs = {}
+                for key, value in arg.kwargs.items():
+                    shared_kwargs[key], shm = _share(value)
+                    segments.append(shm)
+                shared_chunk.append(Arguments(*shared_args, **shared_kwargs))
+            with _executor_lock:
+                future = _pool(max_workers).submit(_run_chunk, target, shared_chunk, fail_fast)
+            chunks[future] = (submitted, chunk, [s for s in segments if s is not None])
+            submitted += len(chunk)
+            pending.append(future) if ordered else pending.add(future)
+
+    def _results(future: Future) -> List[Result]:
+        """ all results of a chunk, so that their segments are released even if the caller stops early """
+        first, chunk, segments = chunks.pop(future)
+        _close(segments, unlink=True)
+        try:
+            chunk_results = future.result()
+        except (BrokenProcessPool, CancelledError) as e:  # a dead worker / shutdown_processes()
+            return [Result(first + i, arg, exception=e) for i, arg in enumerate(chunk)]
+        results = []
+        for i, (value, exception, tb) in enumerate(chunk_results):
+            if isinstance(value, _Shared):
+                value, _ = _attach(value, unlink=True)
+            if exception is not None:
+                exception.__cause__ = _RemoteTraceback(tb)
+            results.append(Result(first + i, chunk[i], value, exception))
+        return results
+
+    with _executor_lock:
+        _pool(max_workers)
+        _executor_calls += 1
+        in_flight = max_workers if _executor_workers > max_workers else 2 * max_workers
+    try:
+        _submit(in_flight)
+        while pending:
+            if ordered:
+                done = (pending.popleft(),)
+                wait(done)
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+            for future in done:
+                for result in _results(future):
+                    if not result.ok:
+                        stop = stop or fail_fast
+                        if not capture:
+                            raise result.exception
+                    yield result if capture else result.value
+                    if stop:
+                        return
+            _submit(len(done))
+    finally:
+        try:
+            for future in pending:
+                future.cancel()
+            for future in tuple(chunks):
+                if future.cancelled():
+                    _close(chunks.pop(future)[2], unlink=True)
+                else:
+                    _results(future)
+        finally:
+            with _executor_lock:
+                _executor_calls -= 1
+
+
+def run_processes(target: Callable, args: Iterable[Arguments], *, max_workers: int | None = None,
+                  chunksize: int | None = None, capture: bool = False, fail_fast: bool = False) -> tuple:
+    """ results in the order of args, see iter_processes """
+    return tuple(iter_processes(target, args, max_workers=max_workers, chunksize=chunksize, ordered=True,
+                                capture=capture, fail_fast=fail_fast))
+
+
+def _square(x: int) -> int:
+    return x * x
+
+
+def _inverse(x: int) -> float:
+    return 1 / x
+
+
+def _pid(_) -> int:
+    return os.getpid()
+
+
+def _exit(x: int) -> int:
+    if x == 3:
+        os._exit(1)
+    return x
+
+
+def _slow(x: int) -> int:
+    time.sleep(.05)
+    return x
+
+
+def _reverse(data: bytes, *, suffix: bytes = b'') -> bytes:
+    return data[::-1] + suffix
+
+
+def _scale(array: 'np.ndarray', factor: float) -> 'np.ndarray':
+    return array * factor
+
+
+class TestProcesses(TestCase):
+    @staticmethod
+    def _segments() -> set:
+        return set(os.listdir('/dev/shm')) if os.path.isdir('/dev/shm') else set()
+
+    def test_run(self):
+        self.assertEqual(run_processes(_square, [Arguments(i) for i in range(100)], max_workers=2),
+                         tuple(i * i for i in range(100)))
+        self.assertEqual(sorted(iter_processes(_square, (Arguments(i) for i in range(50)), max_workers=2,
+                                               chunksize=7)), [i * i for i in range(50)])
+
+    def test_persistent(self):
+        first = set(run_processes(_pid, [Arguments(i) for i in range(20)], max_workers=2, chunksize=1))
+        second = set(run_processes(_pid, [Arguments(i) for i in range(20)], max_workers=2, chunksize=1))
+        self.assertNotIn(os.getpid(), first)
+        self.assertTrue(first & second)
+        self.assertLessEqual(len(first | second), 2)
+
+    def test_exceptions(self):
+        with self.assertRaises(ZeroDivisionError):
+            run_processes(_inverse, [Arguments(i) for i in range(-3, 3)], max_workers=2)
+        results = run_processes(_inverse, [Arguments(i) for i in range(-3, 3)], max_workers=2, chunksize=2,
+                                capture=True)
+        self.assertEqual([r.ok for r in results], [True, True, True, False, True, True])
+        self.assertIn('in _inverse', results[3].traceback)
+        results = run_processes(_inverse, [Arguments(i) for i in range(0, 100)], max_workers=1, chunksize=1,
+                                capture=True, fail_fast=True)
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].ok)
+
+    def test_broken_pool(self):
+        with self.assertRaises(BrokenProcessPool):
+            run_processes(_exit, [Arguments(i) for i in range(6)], max_workers=2, chunksize=1)
+        self.assertEqual(run_processes(_square, [Arguments(i) for i in range(4)], max_workers=2), (0, 1, 4, 9))
+        results = run_processes(_exit, [Arguments(i) for i in range(20)], max_workers=2, chunksize=1, capture=True)
+        self.assertEqual(len(results), 20)
+        self.assertIsInstance(results[3].exception, BrokenProcessPool)
+        self.assertEqual([r.value for r in results[10:]], list(range(10, 20)))
+
+    def test_concurrent(self):
+        shutdown_processes()
+        with ThreadPoolExecutor(1) as threads:
+            first = threads.submit(run_processes, _slow, [Arguments(i) for i in range(20)], max_workers=2,
+                                   chunksize=1)
+            time.sleep(.1)
+            self.assertEqual(run_processes(_square, [Arguments(i) for i in range(8)], max_workers=3),
+                             tuple(i * i for i in range(8)))
+            self.assertEqual(first.result(), tuple(range(20)))
+        results = iter_processes(_slow, [Arguments(i) for i in range(8)], max_workers=1, chunksize=1, ordered=True,
+                                 capture=True)
+        self.assertEqual(next(results).value, 0)
+        shutdown_processes()
+        results = list(results)
+        self.assertTrue(all(r.ok or isinstance(r.exception, CancelledError) for r in results))
+        self.assertEqual([r.index for r in results], list(range(1, 8)))
+
+    def test_shared_bytes(self):
+        before = self._segments()
+        data = bytes(range(256)) * 1024
+        self.assertEqual(run_processes(_reverse, [Arguments(data, suffix=data), Arguments(b'abc')], max_workers=2),
+                         (data[::-1] + data, b'cba'))
+        self.assertEqual(self._segments(), before)
+
+    @skipIf(np is None, 'numpy is not installed')
+    def test_shared_numpy(self):
+        before = self._segments()
+        array = np.arange(100000, dtype=np.float64)
+        result, = run_processes(_scale, [Arguments(array, 2.)], max_workers=2)
+        self.assertTrue(np.array_equal(result, array * 2))
+        self.assertEqual(self._segments(), before)
+
+
+if __name__ == '__main__':
+    main(verbosity=2)
@@ -1,19 +1,51 @@
-from typing import Type
+from collections import OrderedDict
+import reprlib
+import weakref
+from typing import Any, List, Tuple, Type
 from unittest import main, TestCase
 from types import TracebackType
 from sys import exc_info
 from typing import Self
 
 
+class _Repr(reprlib.Repr):
+    """ bounded repr, which does not call repr() of sized objects too long to show (e.g. DataFrames) """
+    def repr_instance(self, x: Any, level: int) -> str:
+        try:
+            size = len(x)
+        except Exception:
+            size = None
+        if size is not None and size > self.maxlist:
+            return f'<{type(x).__name__} len={size}>'
+        return super().repr_instance(x, level)
+
+
+_repr = _Repr()
+_repr.maxstring = _repr.maxother = 40
+
+# (file name, line, function, 'variable=bounded repr, ...')
+_Frame = Tuple[str, int, str, str]
+
+
 class RunStatus:
+    """
+    lazy = True (class-wide): handle_exception only keeps a frame summary (code locations and bounded reprs
+    of the local variables, so no references to them outlive the call), message formats it once on first access.
+    Repeated failures (same exception type and code locations) are sampled: only occurrences 1, 2, 4, 8, ...
+    keep their frames, the others report the repeat count.
+    """
     __excludes = ('self', 'e', '_', 'tb', 'args', 'kwargs')
-    __slots__ = ('success', 'exception_type', 'exception_message', '_message')
+    __slots__ = ('success', 'exception_type', 'exception_message', '_message', '_frames')
+    lazy: bool = False
+    _repeats: OrderedDict[tuple, int] = OrderedDict()
+    _repeats_size = 1024
 
     def __init__(self, status: bool = True, message: str = ''):
         self.success: bool = status
         self.exception_type: Type = type(None)
         self.exception_message: str = ''
         self._message: str = message
+        self._frames: List[_Frame] | None = None
 
     def handle_exception(self, exception: Exception):
         self.success = False
@@ -21,9 +53,36 @@ class RunStatus:
         self.exception_message = str(exception)
         self._message = f'Exception {self.exception_type.__name__} raised: "{self.exception_message}"'
         _, _, tb = exc_info()
-        if tb is not None:
+        if tb is None:
+            return
+        if not self.lazy:
             while tb := tb.tb_next:
                 self._message += self.msg_line(tb)
+            return
+        tbs = []
+        while tb := tb.tb_next:
+            tbs.append(tb)
+        count = self._repeat((self.exception_type,) + tuple((t.tb_frame.f_code, t.tb_lineno) for t in tbs))
+        if count & (count - 1):  # not a power of two
+            self._message += f'\n\t\t>>repeated {count} times'
+            return
+        self._frames = [(t.tb_frame.f_code.co_filename, t.tb_lineno, t.tb_frame.f_code.co_name,
+                         ', '.join([f'{k}={_repr.repr(v)}' for k, v in t.tb_frame.f_locals.items()
+                                    if k not in self.__excludes])) for t in tbs]
+
+    @classmethod
+    def _repeat(cls, key: tuple) -> int:
+        """ occurrence number of the failure, approximate under concurrent failures """
+        repeats = cls._repeats
+        count = repeats.pop(key, 0) + 1
+        repeats[key] = count
+        if len(repeats) > cls._repeats_size:
+            repeats.popitem(last=False)
+        return count
+
+    @classmethod
+    def clear_repeats(cls):
+        cls._repeats.clear()
 
     def __bool__(self):
         return self.success and self.exception_type() is None and self.exception_message == ''
@@ -33,15 +92,24 @@ class RunStatus:
 
     @property
     def message(self) -> str:
+        if self._frames is not None:
+            frames, self._frames = self._frames, None
+            for filename, line, function, variables in frames:
+                self._message += self._line(filename, line, function, variables)
         return self._message
 
     @classmethod
     def msg_line(cls, tb: TracebackType, vars_str_length: int = 80):
         def _vars() -> str:
             return ', '.join([f'{k}={v}' for k, v in tb.tb_frame.f_locals.items() if k not in cls.__excludes])
+        return cls._line(tb.tb_frame.f_code.co_filename, tb.tb_lineno, tb.tb_frame.f_code.co_name, _vars(),
+                         vars_str_length)
+
+    @staticmethod
+    def _line(filename: str, line: int, function: str, variables: str, vars_str_length: int = 80) -> str:
         return (f'\n\t\t>>'
-                f'file: {tb.tb_frame.f_code.co_filename}, line: {tb.tb_lineno}, function: {tb.tb_frame.f_code.co_name},'
-                f'\n\t\t\tvariables: {_vars()[:vars_str_length]}')
+                f'file: {filename}, line: {line}, function: {function},'
+                f'\n\t\t\tvariables: {variables[:vars_str_length]}')
 
 
 class BaseRun:
@@ -94,6 +162,37 @@ class BaseRunTest(TestCase):
         self.assertIn('function: _run', result.status.message)
         self.assertEqual(len(result.status.message.split('\n')), 3)
 
+    def test_lazy(self):
+        class Big(list):
+            def __repr__(self):
+                raise AssertionError('repr of a big object')
+
+        refs = []
+
+        class FailingRun(BaseRun):
+            def _run(self, *args, **kwargs) -> RunStatus:
+                data = Big(range(100000))
+                refs.append(weakref.ref(data))
+                text = 'x' * 1000
+                raise ValueError(len(data) + len(text))
+
+        RunStatus.lazy = True
+        try:
+            RunStatus.clear_repeats()
+            statuses = [FailingRun().run().status for _ in range(5)]
+        finally:
+            RunStatus.lazy = False
+        self.assertEqual([r() for r in refs], [None] * 5)  # locals are not kept until message is read
+        message = statuses[0].message
+        self.assertIn('function: _run', message)
+        self.assertIn("variables: data=<Big len=100000>, text='xxxxxxxxxxxxxxxxx...xxxxxxxxxxxxxxxxxx'", message)
+        self.assertEqual(len(message.split('\n')), 3)
+        self.assertIs(statuses[0].message, message)
+        self.assertIn('function: _run', statuses[3].message)
+        self.assertTrue(statuses[2].message.endswith('>>repeated 3 times'))
+        self.assertIs(statuses[4].exception_type, ValueError)
+        self.assertNotIn('function', statuses[4].message)
+
 
 if __name__ == '__main__':
     main(verbosity=2)
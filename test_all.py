@@ -2,10 +2,17 @@ import unittest
 from run.run import RunStatusTest, BaseRunTest
 from run.run_example import RunExampleTest
 from singleton import SingletonTest
-from data_struct import DataStructTest
+from data_struct import DataStructTest, LazyDataStructTest, StreamDataStructTest, FrozenDataStructTest, RecordTest, \
+    BinaryDataStructTest, DiffPatchTest, FileCacheTest
+from data_table import DataStructTableTest
+from trace_export import TraceExporterTest
 from thread import TestThread, TestArgument
+from process import TestProcesses
+from batch import TestBatch
 from async_edu.corutines import TestAsyncCoroutines
 from async_edu.async_execute import TestAsyncExecute
+from cached.cached import CachedTest, CachedMethodTest, SingleFlightTest, CacheStatsTest, BackendCachedTest
+from cached.backends import CodecTest, BackendTest
 
 
 if __name__ == '__main__':
@@ -1,5 +1,9 @@
-from typing import Any, Callable, Dict, Tuple, Iterable
-from threading import Thread as BaseThread
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from itertools import count, islice
+from typing import Any, Callable, Deque, Dict, Tuple, Iterable, Iterator, Set
+from threading import Event, Lock, Thread as BaseThread, local
+from traceback import format_exception
 import uuid
 from unittest import main, TestCase
 from sys import stderr
@@ -13,28 +17,157 @@ class Arguments:
         self.kwargs: Dict[str, Any] = kwargs
 
 
+class Result:
+    """ value of target(*arg.args, **arg.kwargs) or the exception it raised (with its __traceback__) """
+    __slots__ = ('index', 'arg', 'value', 'exception')
+
+    def __init__(self, index: int, arg: Arguments, value: Any = None, exception: Exception | None = None):
+        self.index = index
+        self.arg = arg
+        self.value = value
+        self.exception = exception
+
+    @property
+    def ok(self) -> bool:
+        return self.exception is None
+
+    @property
+    def traceback(self) -> str:
+        return '' if self.exception is None else ''.join(format_exception(self.exception))
+
+    def get(self) -> Any:
+        """ value, or raise the captured exception """
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+    def __repr__(self):
+        if self.ok:
+            return f'Result({self.index}, value={self.value!r})'
+        return f'Result({self.index}, exception={self.exception!r})'
+
+
 class Thread(BaseThread):
     def __init__(self, target: Callable, arg: Arguments):
         super().__init__(group=None, target=target, name=str(uuid.uuid4()), args=arg.args, kwargs=arg.kwargs)
         self._target = target
         self._value: Any = None
+        self._exception: Exception | None = None
         self._arg = arg
 
     def run(self) -> None:
-        self._value = self._target(*self._arg.args, **self._arg.kwargs)
+        try:
+            self._value = self._target(*self._arg.args, **self._arg.kwargs)
+        except Exception as e:
+            self._exception = e
 
     @property
     def value(self):
+        """ raises the exception of target, if any """
+        if self._exception is not None:
+            raise self._exception
         return self._value
 
+    @property
+    def exception(self) -> Exception | None:
+        return self._exception
 
-def run_threads(target: Callable, args: Iterable[Arguments]) -> tuple:
-    threads = tuple(Thread(target=target, arg=a) for a in args)
-    for thread in threads:
-        thread.start()
-    for thread in threads:
-        thread.join()
-    return tuple(thread.value for thread in threads)
+    @property
+    def result(self) -> Result:
+        return Result(0, self._arg, self._value, self._exception)
+
+
+_local = local()
+
+
+def cancelled() -> bool:
+    """ True in a target run by iter_threads / run_threads with fail_fast=True once another item has failed """
+    event: Event | None = getattr(_local, 'cancel', None)
+    return event is not None and event.is_set()
+
+
+def _call(target: Callable, index: int, arg: Arguments, cancel: Event, fail_fast: bool) -> Result:
+    _local.cancel = cancel
+    try:
+        return Result(index, arg, value=target(*arg.args, **arg.kwargs))
+    except Exception as e:
+        if fail_fast:
+            cancel.set()
+        return Result(index, arg, exception=e)
+    finally:
+        _local.cancel = None
+
+
+DEFAULT_MAX_WORKERS = 64
+
+
+def iter_threads(target: Callable, args: Iterable[Arguments], *, max_workers: int = DEFAULT_MAX_WORKERS,
+                 ordered: bool = False, max_pending: int | None = None, capture: bool = False,
+                 fail_fast: bool = False) -> Iterator[Any]:
+    """
+    Purpose:
+        call target for each item of args on at most max_workers reused threads, yielding results
+        as they complete (ordered=True - in the order of args).
+        args is consumed lazily: at most max_pending (default 2 * max_workers) items are submitted
+        and not yet yielded, so a slow consumer holds back the producer.
+        An exception of target is raised here; closing the iterator drops the items not started yet.
+        capture=True: yield a Result (value or exception) for each item instead of raising.
+        fail_fast=True: after the first exception no more items are started, cancelled() becomes True
+        for the running targets and, once they return, the first exception is raised (or its Result is the last one).
+    Usage:
+    for value in iter_threads(fetch, (Arguments(url) for url in urls), max_workers=16):
+        store(value)
+    """
+    max_pending = 2 * max_workers if max_pending is None else max_pending
+    args = iter(args)
+    executor = ThreadPoolExecutor(max_workers, thread_name_prefix='run_threads')
+    pending: Deque[Future] | Set[Future] = deque() if ordered else set()
+    indices = count()
+    cancel = Event()
+    failed: list[Result] = []
+
+    def _submit(n: int):
+        for arg in islice(args, 0 if cancel.is_set() else n):
+            future = executor.submit(_call, target, next(indices), arg, cancel, fail_fast)
+            pending.append(future) if ordered else pending.add(future)
+
+    try:
+        _submit(max_pending)
+        while pending and not cancel.is_set():
+            if ordered:
+                done = (pending.popleft(),)
+                done[0].result()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                pending.difference_update(done)
+            _submit(len(done))
+            for future in done:
+                result: Result = future.result()
+                if not result.ok:
+                    if not capture:
+                        raise result.exception
+                    if fail_fast:
+                        yield result
+                        return
+                yield result if capture else result.value
+        if cancel.is_set():
+            # the first failure is among the pending items: wait for the running ones, drop the rest
+            executor.shutdown(wait=True, cancel_futures=True)
+            failed = sorted((f.result() for f in pending if not f.cancelled() and not f.result().ok),
+                            key=lambda r: r.index)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    if failed:
+        if not capture:
+            raise failed[0].exception
+        yield failed[0]
+
+
+def run_threads(target: Callable, args: Iterable[Arguments], *, max_workers: int = DEFAULT_MAX_WORKERS,
+                capture: bool = False, fail_fast: bool = False) -> tuple:
+    """ results in the order of args, see iter_threads """
+    return tuple(iter_threads(target, args, max_workers=max_workers, ordered=True, capture=capture,
+                              fail_fast=fail_fast))
 
 
 class TestArgument(TestCase):
@@ -81,6 +214,77 @@ class TestThread(TestCase):
         delta = datetime.now() - start
         self.assertLess(delta.total_seconds(), 0.7, str(delta.total_seconds()))
 
+    def test_bounded(self):
+        lock = Lock()
+        running = [0, 0]  # now, max
+
+        def function(x):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            sleep(.01)
+            with lock:
+                running[0] -= 1
+            return x
+
+        self.assertEqual(run_threads(function, (Arguments(i) for i in range(50)), max_workers=4), tuple(range(50)))
+        self.assertLessEqual(running[1], 4)
+        self.assertEqual(sorted(iter_threads(function, (Arguments(i) for i in range(20)), max_workers=3)),
+                         list(range(20)))
+
+    def test_stream(self):
+        consumed = []
+
+        def args():
+            for i in count():
+                consumed.append(i)
+                yield Arguments(i)
+
+        stream = iter_threads(lambda x: x * 2, args(), max_workers=2, ordered=True)
+        self.assertEqual(list(islice(stream, 5)), [0, 2, 4, 6, 8])
+        self.assertLessEqual(len(consumed), 5 + 4)
+        stream.close()
+        with self.assertRaises(ZeroDivisionError):
+            run_threads(lambda x: 1 / x, (Arguments(i) for i in range(3)))
+
+    def test_capture(self):
+        thread = Thread(lambda x: 1 / x, Arguments(0))
+        thread.start()
+        thread.join()
+        self.assertIsInstance(thread.exception, ZeroDivisionError)
+        self.assertRaises(ZeroDivisionError, lambda: thread.value)
+        self.assertIn('ZeroDivisionError', thread.result.traceback)
+
+        results = run_threads(lambda x: 1 / x, (Arguments(i) for i in range(-2, 3)), capture=True)
+        self.assertEqual([r.ok for r in results], [True, True, False, True, True])
+        self.assertEqual([r.index for r in results], list(range(5)))
+        self.assertEqual(results[0].get(), -.5)
+        self.assertIn('in <lambda>', results[2].traceback)
+        self.assertRaises(ZeroDivisionError, results[2].get)
+
+    def test_fail_fast(self):
+        started = []
+
+        def function(x):
+            started.append(x)
+            if x == 3:
+                raise ValueError(x)
+            while not cancelled():
+                sleep(.01)
+            return x
+
+        start = datetime.now()
+        with self.assertRaises(ValueError):
+            run_threads(function, (Arguments(i) for i in range(1000)), max_workers=4, fail_fast=True)
+        self.assertLess(len(started), 20)
+        self.assertLess((datetime.now() - start).total_seconds(), 1)
+
+        results = list(iter_threads(function, (Arguments(i) for i in range(1000)), max_workers=4, capture=True,
+                                    fail_fast=True))
+        self.assertIsInstance(results[-1].exception, ValueError)
+        self.assertTrue(all(r.ok for r in results[:-1]))
+        self.assertFalse(cancelled())
+
 
 if __name__ == '__main__':
     main(verbosity=2)
@@ -0,0 +1,178 @@
+from collections import deque
+import json
+from logging import getLogger
+import os
+from pathlib import Path
+from threading import Event, Lock, Thread, get_ident
+import time
+from typing import Any, Callable, Deque, Dict
+import unittest
+
+
+class _Flusher:
+    """
+    Background thread calling flush() every `interval` seconds, so that producers only touch memory.
+    A failed flush is logged and retried at the next interval. close() stops the thread and flushes what is left.
+    """
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = Event()
+        self._lock = Lock()
+        self._thread = Thread(target=self._run, name=f'{self.__class__.__name__}-flusher', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                getLogger(__name__).exception(f'{self.__class__.__name__} flush failed')
+
+    def flush(self):
+        with self._lock:
+            self._flush()
+
+    def _flush(self):
+        raise NotImplementedError('Implement _flush in class derived from _Flusher')
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class TraceExporter(_Flusher):
+    """
+    Purpose:
+        write spans as Chrome/Perfetto trace events (JSON array format, complete 'X' events).
+        span() only appends to a bounded buffer: when it is full new spans are dropped and counted in `dropped`.
+        The file is opened with '[' and events are appended by the flusher; the closing ']' is optional
+        for trace viewers and is written by close().
+    Usage:
+    with TraceExporter(Path('trace.json')) as exporter:
+        timer = Timer(exporter=exporter)
+        ...
+    """
+    def __init__(self, path: Path, *, interval: float = 1., capacity: int = 100000):
+        self.path = Path(path)
+        self.capacity = capacity
+        self.dropped = 0
+        self._events: Deque[Dict[str, Any]] = deque()
+        self._pid = os.getpid()
+        self.path.write_text('[\n')
+        super().__init__(interval)
+
+    def span(self, name: str, start_ns: int, duration_ns: int, **args: Any):
+        """ start_ns: time.perf_counter_ns() at the span start """
+        if len(self._events) >= self.capacity:
+            self.dropped += 1
+            return
+        event = {'name': name, 'ph': 'X', 'ts': start_ns / 1000, 'dur': duration_ns / 1000,
+                 'pid': self._pid, 'tid': get_ident()}
+        if args:
+            event['args'] = args
+        self._events.append(event)
+
+    def _flush(self):
+        lines = []
+        while self._events:
+            lines.append(json.dumps(self._events.popleft(), default=str))
+        if lines:
+            with open(self.path, 'a') as file:
+                file.write(',\n'.join(lines) + ',\n')
+
+    def close(self):
+        super().close()
+        with open(self.path, 'a') as file:
+            file.write(json.dumps({'name': 'trace_end', 'ph': 'i', 'ts': time.perf_counter_ns() / 1000,
+                                   'pid': self._pid, 'tid': get_ident(), 's': 'g'}) + '\n]\n')
+
+
+def _label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class PrometheusExporter(_Flusher):
+    """
+    Purpose:
+        periodically write timing statistics in the Prometheus text exposition format,
+        e.g. for the node_exporter textfile collector. The file is replaced atomically.
+        stats: callable returning {name: {'count', 'total', 'p50', 'p90', 'p99', ...}} (seconds), like Timer.stats
+    Usage:
+    timer = Timer()
+    exporter = PrometheusExporter(Path('timer.prom'), timer.stats, metric='app_section')
+    """
+    def __init__(self, path: Path, stats: Callable[[], Dict[str, Dict[str, float]]], *,
+                 metric: str = 'timer', interval: float = 15.):
+        self.path = Path(path)
+        self.metric = f'{metric}_seconds'
+        self._stats = stats
+        super().__init__(interval)
+
+    def render(self) -> str:
+        lines = [f'# HELP {self.metric} Time spent in measured sections.', f'# TYPE {self.metric} summary']
+        for name, s in self._stats().items():
+            label = f'name="{_label(name)}"'
+            for q in (50, 90, 99):
+                lines.append(f'{self.metric}{{{label},quantile="{q / 100}"}} {s[f"p{q}"]!r}')
+            lines.append(f'{self.metric}_sum{{{label}}} {s["total"]!r}')
+            lines.append(f'{self.metric}_count{{{label}}} {s["count"]}')
+        return '\n'.join(lines) + '\n'
+
+    def _flush(self):
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+        tmp.write_text(self.render())
+        os.replace(tmp, self.path)
+
+
+class TraceExporterTest(unittest.TestCase):
+    def test_trace(self):
+        path = Path('test_trace.json')
+        with TraceExporter(path, interval=.05, capacity=3) as exporter:
+            exporter.span('a', 1000, 2000, n=1)
+            exporter.span('b', 5000, 1000)
+            time.sleep(.15)
+            self.assertTrue(path.read_text().startswith('[\n{"name": "a"'))
+            for i in range(4):
+                exporter.span('c', i, 1)
+            self.assertEqual(exporter.dropped, 1)
+        events = json.loads(path.read_text())
+        self.assertEqual([e['name'] for e in events], ['a', 'b', 'c', 'c', 'c', 'trace_end'])
+        self.assertEqual((events[0]['ts'], events[0]['dur'], events[0]['args']), (1., 2., {'n': 1}))
+        path.unlink()
+
+    def test_prometheus(self):
+        path = Path('test_timer.prom')
+        stats = {'a "q"': {'count': 2, 'total': .5, 'p50': .2, 'p90': .3, 'p99': .3}}
+        exporter = PrometheusExporter(path, lambda: stats, metric='app', interval=60)
+        exporter.close()
+        text = path.read_text()
+        self.assertIn('# TYPE app_seconds summary', text)
+        self.assertIn('app_seconds{name="a \\"q\\"",quantile="0.5"} 0.2\n', text)
+        self.assertIn('app_seconds_count{name="a \\"q\\""} 2\n', text)
+        path.unlink()
+
+    def test_flush_errors(self):
+        class Failing(_Flusher):
+            calls = 0
+
+            def _flush(self):
+                self.calls += 1
+                if self.calls == 1:
+                    raise RuntimeError('flush error')
+
+        with self.assertLogs(__name__, 'ERROR'):
+            flusher = Failing(.02)
+            time.sleep(.15)
+            flusher.close()
+        self.assertGreater(flusher.calls, 2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)